@@ -0,0 +1,243 @@
+"""
+Server HTTP gia lap CellphoneS + Phong Vu de benchmark khong can mang
+
+Trang duoc sinh tu mau HTML giong cau truc that (cung selector ma
+product_parser / crawl_engine doc), du lieu xac dinh theo so thu tu:
+
+    /cellphones.com.vn/<slug>-<i>.html   trang chi tiet: gia, anh, JSON-LD, bang thong so
+                                         rut gon + nut .button__show-modal-technical mo
+                                         modal day du (chen bang JS nhu trang that)
+    /cellphones.com.vn/laptop.html       trang danh sach .product-info-container + nut Xem them
+    /c/laptop?page=N                     trang Phong Vu voi __NEXT_DATA__ (serverProducts)
+
+Duong dan CellphoneS co chua "cellphones.com.vn" de qua buoc kiem tra URL
+cua crawler. Do tre gia lap: --latency-ms +- --jitter-ms moi response.
+
+    python benchmark/fixture_server.py --port 8800 --latency-ms 80
+"""
+
+import argparse
+import html
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+PRODUCTS = 200
+LISTING_PAGE_SIZE = 20
+# So dong thong so hien san tren trang (phan con lai chi co trong modal)
+INLINE_SPECS = 6
+
+SPEC_TEMPLATE = [
+    ('Loại CPU', 'Intel Core i{cpu}-1{i:03d}H'),
+    ('Dung lượng RAM', '{ram}GB'),
+    ('Ổ cứng', '{ssd}GB SSD NVMe PCIe'),
+    ('Kích thước màn hình', '15.6 inches'),
+    ('Công nghệ màn hình', 'IPS, 144Hz, 100% sRGB'),
+    ('Tần số quét', '144Hz'),
+    ('Loại card đồ họa', 'NVIDIA GeForce RTX 40{gpu}0 {vram}GB GDDR6'),
+    ('Trọng lượng', '2.{w} kg'),
+    ('Dung lượng pin', '{bat} Wh'),
+    ('Hệ điều hành', 'Windows 11 Home'),
+    ('Cổng giao tiếp', '1x USB-C, 2x USB-A 3.2, 1x HDMI 2.1, 1x RJ45'),
+    ('Kết nối không dây', 'Wi-Fi 6E, Bluetooth 5.3'),
+    ('Webcam', 'HD 720p'),
+    ('Bàn phím', 'Có đèn nền RGB, bàn phím số'),
+    ('Chất liệu', 'Nhựa, nắp lưng kim loại'),
+    ('Kích thước', '359 x 256 x 22.9 mm'),
+    ('Âm thanh', '2 loa, Dolby Atmos'),
+    ('Bảo mật', 'Vân tay, TPM 2.0'),
+    ('Khe RAM', '2 khe, tối đa 32GB'),
+    ('Khe SSD', '2 khe M.2'),
+    ('Độ phân giải màn hình', '1920 x 1080 pixels (FullHD)'),
+    ('Tấm nền', 'IPS'),
+    ('Độ sáng', '300 nits'),
+    ('Màu sắc', 'Xám'),
+    ('Năm ra mắt', '2024'),
+]
+
+
+def product_data(i):
+    """Du lieu san pham thu i (xac dinh, khong ngau nhien)"""
+    price = 15_000_000 + (i * 37_000) % 20_000_000
+    values = {'i': i, 'cpu': 5 + 2 * (i % 3), 'ram': 8 * (1 + i % 4), 'ssd': 512 * (1 + i % 2),
+              'gpu': 5 + i % 3, 'vram': 6 + 2 * (i % 2), 'w': i % 10, 'bat': 50 + i % 40}
+    return {
+        'i': i,
+        'slug': f'laptop-asus-vivobook-{i}',
+        'sku': f'laptop-asus-vivobook-{i}',
+        'name': f'Laptop ASUS Vivobook {i} {values["ram"]}GB {values["ssd"]}GB',
+        'price': price,
+        'original_price': price + 2_000_000,
+        'in_stock': i % 7 != 0,
+        'specs': [(k, v.format(**values)) for k, v in SPEC_TEMPLATE],
+    }
+
+
+def _money(value):
+    return f'{value:,}'.replace(',', '.') + 'đ'
+
+
+def _spec_rows(specs):
+    return ''.join(f'<tr><td>{html.escape(k)}</td><td>{html.escape(v)}</td></tr>' for k, v in specs)
+
+
+def render_product(i):
+    p = product_data(i)
+    ld = {
+        '@context': 'https://schema.org', '@type': 'Product', 'name': p['name'], 'sku': p['sku'],
+        'image': f'https://cdn2.cellphones.com.vn/media/catalog/product/{p["slug"]}.jpg',
+        'offers': {'@type': 'Offer', 'price': str(p['price']), 'priceCurrency': 'VND',
+                   'availability': 'https://schema.org/' + ('InStock' if p['in_stock'] else 'OutOfStock')},
+    }
+    modal_rows = json.dumps(_spec_rows(p['specs']))
+    return f'''<!DOCTYPE html>
+<html lang="vi"><head><meta charset="utf-8"><title>{html.escape(p['name'])}</title>
+<script type="application/ld+json">{json.dumps(ld, ensure_ascii=False)}</script>
+</head><body>
+<div class="box-product-name"><h1>{html.escape(p['name'])}</h1></div>
+<div class="box-gallery__detail"><img src="{ld['image']}" alt=""></div>
+<div class="box-info__box-price">
+  <div class="tpt---sale-price"><p class="sale-price"><span>{_money(p['price'])}</span></p>
+  <p class="base-price">{_money(p['original_price'])}</p></div>
+</div>
+<div class="technical-content"><table>{_spec_rows(p['specs'][:INLINE_SPECS])}</table></div>
+<button class="button__show-modal-technical">Xem cấu hình chi tiết</button>
+<script>
+document.querySelector('.button__show-modal-technical').addEventListener('click', () => {{
+  setTimeout(() => {{
+    const modal = document.createElement('div');
+    modal.className = 'modal modal-technical is-active';
+    modal.innerHTML = '<table>' + {modal_rows} + '</table>';
+    document.body.appendChild(modal);
+  }}, 50);
+}});
+</script>
+</body></html>'''
+
+
+def _listing_cards(start, count, total):
+    cards = []
+    for i in range(start, min(start + count, total)):
+        p = product_data(i)
+        cards.append(f'''<div class="product-info-container"><div class="product-info">
+<a class="product__link" href="/cellphones.com.vn/{p['slug']}.html">
+<img class="product__img" src="https://cdn2.cellphones.com.vn/media/catalog/product/{p['slug']}.jpg">
+<div class="product__name"><h3>{html.escape(p['name'])}</h3></div></a>
+<div class="block-box-price"><p class="product__price--show">{_money(p['price'])}</p>
+<p class="product__price--through">{_money(p['original_price'])}</p>
+<div class="product__price--percent-detail"><span>Giảm 10%</span></div></div>
+</div></div>''')
+    return ''.join(cards)
+
+
+def render_listing(total):
+    first = _listing_cards(0, LISTING_PAGE_SIZE, total)
+    return f'''<!DOCTYPE html>
+<html lang="vi"><head><meta charset="utf-8"><title>Laptop</title></head><body>
+<div class="product-list-filter">{first}</div>
+<a class="button btn-show-more button__show-more-product">Xem thêm</a>
+<script>
+let page = 1;
+document.querySelector('.btn-show-more').addEventListener('click', async () => {{
+  const html = await (await fetch('/cellphones.com.vn/laptop-more?page=' + page++)).text();
+  document.querySelector('.product-list-filter').insertAdjacentHTML('beforeend', html);
+  if (!html) document.querySelector('.btn-show-more').remove();
+}});
+</script>
+</body></html>'''
+
+
+def render_phongvu(page, total):
+    start = (page - 1) * LISTING_PAGE_SIZE
+    products = []
+    for i in range(start, min(start + LISTING_PAGE_SIZE, total)):
+        p = product_data(i)
+        products.append({
+            'sku': f'PV{i:06d}', 'name': p['name'], 'brand': {'name': 'ASUS'},
+            'price': {'latestPrice': p['price'], 'supplierRetailPrice': p['original_price'], 'discountPercent': 10},
+            'imageUrl': f'https://lh3.googleusercontent.com/{p["slug"]}',
+            'link': {'as': {'pathname': f'/{p["slug"]}--s{i:06d}'}},
+            'stockQuantity': 0 if not p['in_stock'] else 5,
+        })
+    data = {'props': {'pageProps': {'serverProducts': products, 'menu': [{'url': '/c/laptop'}]}},
+            'page': '/c/[slug]', 'buildId': 'fixture'}
+    return f'''<!DOCTYPE html><html><head><meta charset="utf-8"></head><body><div id="__next"></div>
+<script id="__NEXT_DATA__" type="application/json">{json.dumps(data, ensure_ascii=False)}</script>
+</body></html>'''
+
+
+PRODUCT_RE = re.compile(r'^/cellphones\.com\.vn/laptop-asus-vivobook-(\d+)\.html$')
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Tra trang gia lap sau mot khoang tre"""
+
+    latency = 0.0
+    jitter = 0.0
+    products = PRODUCTS
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        if delay:
+            time.sleep(delay)
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        page = int(query.get('page', ['1'])[0] or 1)
+        match = PRODUCT_RE.match(url.path)
+
+        if match and int(match.group(1)) < self.products:
+            body = render_product(int(match.group(1)))
+        elif url.path == '/cellphones.com.vn/laptop.html':
+            body = render_listing(self.products)
+        elif url.path == '/cellphones.com.vn/laptop-more':
+            body = _listing_cards(page * LISTING_PAGE_SIZE, LISTING_PAGE_SIZE, self.products)
+        elif url.path == '/c/laptop':
+            body = render_phongvu(page, self.products)
+        else:
+            self.send_error(404)
+            return
+
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(port=0, latency_ms=0, jitter_ms=0, products=PRODUCTS):
+    """Tao server (chua chay); port 0 = tu chon, doc lai qua server.server_port"""
+    handler = type('Handler', (FixtureHandler,), {
+        'latency': latency_ms / 1000, 'jitter': jitter_ms / 1000, 'products': products})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def product_urls(base_url, count):
+    """URL trang chi tiet cua `count` san pham dau"""
+    return [f'{base_url}/cellphones.com.vn/{product_data(i)["slug"]}.html' for i in range(count)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Server gia lap CellphoneS / Phong Vu')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Do tre moi response (ms)')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Do lech ngau nhien quanh latency (ms)')
+    parser.add_argument('--products', type=int, default=PRODUCTS, help='So san pham gia lap')
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency_ms, args.jitter_ms, args.products)
+    print(f'Fixture server: http://127.0.0.1:{server.server_port}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
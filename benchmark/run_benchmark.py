@@ -0,0 +1,254 @@
+"""
+Benchmark crawler offline voi server gia lap (benchmark/fixture_server.py)
+
+Chay end-to-end ba duong crawl tren trang gia lap co do tre cau hinh duoc:
+
+    product  crawler.crawl_cellphones_product (HTTP truoc, browser khi thieu)
+    specs    crawl_cellphones.get_full_specs (click modal thong so)
+    phongvu  crawl_phongvu.crawl_10_products (__NEXT_DATA__)
+
+va in pages/sec, p50/p95 moi trang, so loi va peak RSS cua process crawl
+(khong tinh server gia lap va Chromium). Dung truoc moi lan deploy:
+
+    python benchmark/run_benchmark.py --latency-ms 80 --save bench.json
+    python benchmark/run_benchmark.py --latency-ms 80 --baseline bench.json
+
+Voi --baseline, exit code 1 neu pages/sec giam hoac p95 tang qua --tolerance.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_SERVER = os.path.join(ROOT, 'benchmark', 'fixture_server.py')
+TARGETS = ('product', 'specs', 'phongvu')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark crawler voi server gia lap')
+    parser.add_argument('--targets', default=','.join(TARGETS), help=f'Danh sach cach nhau dau phay: {",".join(TARGETS)}')
+    parser.add_argument('--pages', type=int, default=50, help='So trang chi tiet cho product / specs')
+    parser.add_argument('--repeat', type=int, default=10, help='So lan chay crawl_10_products')
+    parser.add_argument('--concurrency', type=int, default=8, help='So trang crawl song song')
+    parser.add_argument('--mode', choices=['auto', 'http', 'browser'], default='auto', help='CRAWL_MODE')
+    parser.add_argument('--latency-ms', type=float, default=50, help='Do tre gia lap moi response (ms)')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='Do lech ngau nhien quanh latency (ms)')
+    parser.add_argument('--rate-limit', action='store_true', help='Giu rate limiter (mac dinh tat de do crawler)')
+    parser.add_argument('--save', help='Ghi ket qua ra file JSON')
+    parser.add_argument('--baseline', help='So sanh voi ket qua JSON da luu')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Muc giam cho phep so voi baseline (0.2 = 20%%)')
+    return parser.parse_args()
+
+
+def configure_env(args):
+    """Dat bien moi truong truoc khi import module crawler (doc config luc import)"""
+    os.environ['CRAWL_MODE'] = args.mode
+    os.environ['CRAWL_RETRIES'] = '0'
+    os.environ['BROWSER_POOL_SIZE'] = str(args.concurrency)
+    os.environ['CRAWL_CONCURRENCY'] = str(args.concurrency)
+    if not args.rate_limit:
+        os.environ['RATE_LIMIT_RPS'] = '0'
+    workdir = tempfile.mkdtemp(prefix='crawl-bench-')
+    os.environ['DATABASE'] = os.path.join(workdir, 'bench.db')
+    os.environ['SNAPSHOT_DIR'] = os.path.join(workdir, 'snapshots')
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.join(ROOT, 'cellphones-web'))
+
+
+@contextlib.contextmanager
+def fixture_server(args, products):
+    """Chay server gia lap o process rieng, tra ve base URL"""
+    proc = subprocess.Popen(
+        [sys.executable, FIXTURE_SERVER, '--port', '0', '--latency-ms', str(args.latency_ms),
+         '--jitter-ms', str(args.jitter_ms), '--products', str(products)],
+        stdout=subprocess.PIPE, text=True)
+    try:
+        line = proc.stdout.readline()
+        match = re.search(r'http://[\d.]+:\d+', line)
+        if not match:
+            raise RuntimeError(f'Khong khoi dong duoc fixture server: {line!r}')
+        yield match.group(0)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def percentile(values, q):
+    """Percentile (nearest-rank) cua list so"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def summarize(name, latencies, errors, elapsed, pages):
+    return {
+        'target': name,
+        'pages': pages,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+    }
+
+
+def bench_product(urls, concurrency):
+    from crawl_errors import classify
+    from crawler import crawl_cellphones_product
+
+    def one(url):
+        start = time.perf_counter()
+        try:
+            crawl_cellphones_product(url, force=True)
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, classify(e)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(one, urls))
+    elapsed = time.perf_counter() - start
+    errors = [e for _, e in results if e]
+    if errors:
+        print(f"    [!] product: {len(errors)} loi, vd: {errors[0].kind} {errors[0]}")
+    return summarize('product', [t for t, _ in results], len(errors), elapsed, len(urls))
+
+
+def bench_specs(urls, concurrency):
+    from crawl_cellphones import get_full_specs
+    from crawl_engine import CrawlEngine
+
+    async def run():
+        # Chromium chi khoi dong khi that su can (mode browser / HTML thieu thong so)
+        engine = CrawlEngine(concurrency=concurrency)
+        limit = asyncio.Semaphore(concurrency)
+
+        async def one(url):
+            async with limit:
+                start = time.perf_counter()
+                specs = await get_full_specs(engine, url)
+                return time.perf_counter() - start, bool(specs)
+
+        try:
+            return await asyncio.gather(*(one(url) for url in urls))
+        finally:
+            await engine.close()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for _, ok in results if not ok)
+    return summarize('specs', [t for t, _ in results], errors, elapsed, len(urls))
+
+
+def bench_phongvu(base_url, repeat):
+    import crawl_phongvu
+
+    crawl_phongvu.BASE_URL = base_url
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            products = crawl_phongvu.crawl_10_products()
+        latencies.append(time.perf_counter() - t)
+        errors += not products
+    elapsed = time.perf_counter() - start
+    # Moi lan goi = mot trang danh sach
+    return summarize('phongvu', latencies, errors, elapsed, repeat)
+
+
+def peak_rss_mb():
+    """Peak RSS cua process nay (ru_maxrss: KB tren Linux, byte tren macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def compare(results, baseline, tolerance):
+    """Cac dong hoi quy so voi baseline (list chuoi, rong = ok)"""
+    old = {r['target']: r for r in baseline['results']}
+    problems = []
+    for r in results:
+        before = old.get(r['target'])
+        if not before:
+            continue
+        if before['pages_per_sec'] and r['pages_per_sec'] is not None \
+                and r['pages_per_sec'] < before['pages_per_sec'] * (1 - tolerance):
+            problems.append(f"{r['target']}: pages/sec {before['pages_per_sec']} -> {r['pages_per_sec']}")
+        if before['p95_ms'] and r['p95_ms'] is not None and r['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            problems.append(f"{r['target']}: p95 {before['p95_ms']}ms -> {r['p95_ms']}ms")
+        if r['errors'] > before['errors']:
+            problems.append(f"{r['target']}: loi {before['errors']} -> {r['errors']}")
+    return problems
+
+
+def main():
+    args = parse_args()
+    targets = [t.strip() for t in args.targets.split(',') if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        sys.exit(f"Target khong hop le: {', '.join(sorted(unknown))}")
+
+    configure_env(args)
+    from database import init_db
+    from fixture_server import product_urls  # cung thu muc voi script nay
+    init_db()
+
+    with fixture_server(args, max(args.pages, 20)) as base_url:
+        print(f"[*] Fixture server {base_url} | mode={args.mode} latency={args.latency_ms}+-{args.jitter_ms}ms "
+              f"concurrency={args.concurrency}")
+        urls = product_urls(base_url, args.pages)
+        results = []
+        for target in targets:
+            if target == 'product':
+                results.append(bench_product(urls, args.concurrency))
+            elif target == 'specs':
+                results.append(bench_specs(urls, args.concurrency))
+            else:
+                results.append(bench_phongvu(base_url, args.repeat))
+
+    report = {
+        'config': {k: getattr(args, k) for k in ('mode', 'pages', 'repeat', 'concurrency', 'latency_ms',
+                                                  'jitter_ms', 'rate_limit')},
+        'results': results,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+    print(f"\n{'target':<10}{'pages':>7}{'errors':>8}{'pages/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for r in results:
+        print(f"{r['target']:<10}{r['pages']:>7}{r['errors']:>8}{r['pages_per_sec']!s:>10}"
+              f"{r['p50_ms']!s:>10}{r['p95_ms']!s:>10}")
+    print(f"\nPeak RSS: {report['peak_rss_mb']} MB")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[*] Da luu ket qua: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print("\n[!] Hoi quy so voi baseline:")
+            for line in problems:
+                print(f"    - {line}")
+            sys.exit(1)
+        print("[*] Khong co hoi quy so voi baseline")
+
+
+if __name__ == '__main__':
+    main()
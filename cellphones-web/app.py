@@ -6,291 +6,502 @@ import sys
 import io
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_cors import CORS
-import sqlite3
+import base64
+import binascii
+import csv
+import os
 import json
 import re
+import tempfile
 import time
 from datetime import datetime
-from playwright.sync_api import sync_playwright
+from functools import partial
+
+from crawl_state import CrawlState
+from crawler import browser_pool, crawl_and_save
+from database import get_db, get_price_history, get_spec_keys, init_db, normalize_spec_value
+from jobs import JobManager
+from metrics import GaugeFunc, render as render_metrics
+from product_parser import normalize_spec_key, strip_accents
+from rate_limit import limiter
+from scheduler import RefreshScheduler, pick_stale_products
+from write_buffer import WriteBuffer
 
 app = Flask(__name__)
 CORS(app)
 
-DATABASE = 'products.db'
+# Kich thuoc trang mac dinh / toi da cua /api/products
+PRODUCTS_PAGE_SIZE = 50
+PRODUCTS_MAX_LIMIT = 500
+PRODUCT_FIELDS = ['id', 'sku', 'name', 'brand', 'price', 'original_price', 'discount', 'image',
+                  'url', 'in_stock', 'specs', 'created_at', 'updated_at']
+
+# Cot mac dinh cua /api/search va so tu toi da trong mot truy van
+SEARCH_FIELDS = ['sku', 'name', 'brand', 'price', 'original_price', 'image', 'url', 'in_stock']
+SEARCH_MAX_TERMS = 10
+
+# Cot co dinh cua file export (giong exportProductsToCSV o frontend)
+EXPORT_FIELDS = ['sku', 'name', 'brand', 'price', 'original_price', 'discount', 'url', 'image']
+EXPORT_COLUMNS = ['#', 'SKU', 'Name', 'Brand', 'Price', 'Original Price', 'Discount', 'URL', 'Image']
+
+# Gioi han so URL moi batch va so page crawl song song
+BATCH_MAX_URLS = int(os.environ.get('BATCH_MAX_URLS', '2000'))
+BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '16'))
+# Stream tien do job (SSE): comment keep-alive moi N giay, dong stream sau
+# JOB_EVENTS_MAX_SECONDS de tra thread cho gunicorn (EventSource tu noi lai
+# voi Last-Event-ID, khong mat event)
+JOB_EVENTS_KEEPALIVE = int(os.environ.get('JOB_EVENTS_KEEPALIVE', '15'))
+JOB_EVENTS_MAX_SECONDS = int(os.environ.get('JOB_EVENTS_MAX_SECONDS', '300'))
+
+# Toan tu cua filter spec.<key>.<op> tren bang specs
+SPEC_FILTER_OPS = {
+    'eq': 'value_norm = ?',
+    'contains': 'value_norm LIKE ?',
+    'min': 'value_num >= ?',
+    'max': 'value_num <= ?',
+}
+
+
+# Hang doi batch job luu xuong SQLite (crawl_state.db) de resume sau restart
+crawl_state = CrawlState()
+# Batch job ghi database theo lo (crawl don le qua /api/crawl van ghi ngay)
+write_buffer = WriteBuffer()
+job_manager = JobManager(partial(crawl_and_save, buffer=write_buffer),
+                         default_concurrency=browser_pool.size,
+                         max_concurrency=BATCH_MAX_CONCURRENCY,
+                         state=crawl_state,
+                         buffer=write_buffer)
+# Checkpoint chi danh dau URL khi ket qua da commit xuong products.db
+write_buffer.on_flush = job_manager.committed
+
+# Toc do rate limiter hien tai theo host (giam khi bi 429 / 503)
+GaugeFunc('crawl_host_rate', 'Toc do request cho phep hien tai theo host (req/s)', ['host'],
+          lambda: {(host, ): s['rate'] for host, s in limiter.snapshot().items()})
+
+# Tu crawl lai san pham cu (bat bang REFRESH_PAGES_PER_HOUR)
+refresh_scheduler = RefreshScheduler(job_manager.submit)
 
 
-def get_db():
-    """Ket noi database"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Routes
+@app.route('/')
+def index():
+    """Trang chu"""
+    return render_template('index.html')
 
 
-def init_db():
-    """Khoi tao database"""
-    conn = get_db()
-    conn.executescript('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sku TEXT UNIQUE NOT NULL,
-            name TEXT NOT NULL,
-            brand TEXT,
-            price INTEGER,
-            original_price INTEGER,
-            discount TEXT,
-            image TEXT,
-            url TEXT UNIQUE NOT NULL,
-            in_stock INTEGER DEFAULT 1,
-            specs TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS crawl_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            url TEXT NOT NULL,
-            status TEXT NOT NULL,
-            message TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        );
-    ''')
-    conn.commit()
-    conn.close()
+@app.route('/api/crawl', methods=['POST'])
+def api_crawl():
+    """API crawl san pham"""
+    data = request.json
+    url = data.get('url', '').strip()
 
+    if not url:
+        return jsonify({'success': False, 'error': 'Vui long nhap URL san pham'})
 
-def crawl_cellphones_product(url):
-    """Crawl thong tin san pham tu CellphoneS"""
+    # force: bo qua kiem tra van tay, luon crawl day du
+    return jsonify(crawl_and_save(url, bool(data.get('force'))))
 
-    if 'cellphones.com.vn' not in url:
-        return {'error': 'URL khong phai tu CellphoneS'}
 
-    product = {}
+@app.route('/api/crawl/batch', methods=['POST'])
+def api_crawl_batch():
+    """API tao batch job crawl nhieu URL, tra ve job id"""
+    data = request.json or {}
+    urls = data.get('urls')
+    if not isinstance(urls, list):
+        return jsonify({'success': False, 'error': 'urls phai la danh sach URL'}), 400
+    urls = [u.strip() for u in urls if isinstance(u, str) and u.strip()]
+    # Bo URL trung nhung giu thu tu
+    urls = list(dict.fromkeys(urls))
+
+    if not urls:
+        return jsonify({'success': False, 'error': 'Vui long nhap it nhat 1 URL'}), 400
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({'success': False, 'error': f'Toi da {BATCH_MAX_URLS} URL moi batch'}), 400
 
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            )
-            page = context.new_page()
-
-            # Truy cap trang san pham
-            page.goto(url, wait_until='networkidle', timeout=60000)
-
-            # Lay ten san pham
-            name_el = page.query_selector('h1')
-            product['name'] = name_el.inner_text().strip() if name_el else ''
-
-            # Lay gia - thu nhieu selectors
-            price = 0
-            price_selectors = [
-                '.tpt---sale-price .sale-price span',
-                '.sale-price span',
-                '.product__price--show',
-                '.box-info__box-price .product__price--show',
-                '.product-price .sale-price',
-            ]
-            for sel in price_selectors:
-                price_el = page.query_selector(sel)
-                if price_el:
-                    price_text = price_el.inner_text()
-                    price = parse_price(price_text)
-                    if price > 0:
-                        break
-            product['price'] = price
-
-            # Lay gia goc
-            original_price = price
-            original_selectors = [
-                '.tpt---sale-price .base-price',
-                '.base-price',
-                '.product__price--through',
-                '.product-price del',
-            ]
-            for sel in original_selectors:
-                original_el = page.query_selector(sel)
-                if original_el:
-                    original_text = original_el.inner_text()
-                    original_price = parse_price(original_text)
-                    if original_price > 0:
-                        break
-            product['original_price'] = original_price if original_price > 0 else price
-
-            # Lay discount
-            discount = ''
-            if product['original_price'] > product['price'] and product['price'] > 0:
-                discount_percent = round((product['original_price'] - product['price']) / product['original_price'] * 100)
-                discount = f"-{discount_percent}%"
-            product['discount'] = discount
-
-            # Lay hinh anh - thu nhieu selectors
-            image = ''
-            img_selectors = [
-                '.box-gallery__detail img',
-                '.box-gallery__image img',
-                '.gallery-product img',
-                '.swiper-slide img[src*="cellphones"]',
-                '.product-image img',
-                'img[src*="media/catalog"]',
-            ]
-            for sel in img_selectors:
-                img_el = page.query_selector(sel)
-                if img_el:
-                    src = img_el.get_attribute('src') or img_el.get_attribute('data-src')
-                    # Bo qua youtube thumbnail
-                    if src and 'youtube' not in src and 'data:image' not in src:
-                        image = src
-                        break
-            product['image'] = image
-
-            # Lay SKU tu URL
-            product['sku'] = url.split('/')[-1].replace('.html', '')
-            product['url'] = url
-            product['brand'] = extract_brand(product['name'])
-            product['in_stock'] = True
-
-            # Click nut "Xem tat ca" de lay full thong so
-            specs = {}
-            show_all_btn = page.query_selector('.button__show-modal-technical')
-            if show_all_btn:
-                show_all_btn.click()
-                time.sleep(1)
-
-                # Lay thong so tu modal
-                modal = page.query_selector('.modal.is-active, [class*="modal"][class*="active"]')
-                if modal:
-                    rows = modal.query_selector_all('tr')
-                    for row in rows:
-                        cols = row.query_selector_all('td')
-                        if len(cols) >= 2:
-                            key = cols[0].inner_text().strip()
-                            value = cols[1].inner_text().strip()
-                            if key and value:
-                                specs[key] = value
-
-            # Neu khong lay duoc tu modal, lay tu trang chinh
-            if not specs:
-                rows = page.query_selector_all('.technical-content tr')
-                for row in rows:
-                    cols = row.query_selector_all('td')
-                    if len(cols) >= 2:
-                        key = cols[0].inner_text().strip()
-                        value = cols[1].inner_text().strip()
-                        if key and value:
-                            specs[key] = value
-
-            product['specs'] = specs
-            browser.close()
-
-    except Exception as e:
-        return {'error': str(e)}
+        concurrency = int(data.get('concurrency') or 0)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'concurrency phai la so nguyen'}), 400
+
+    job = job_manager.submit(urls, concurrency or None)
+    return jsonify({'success': True, 'job_id': job.id, 'total': len(urls)})
+
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """API lay tien do batch job"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Khong tim thay job'}), 404
+
+    since = request.args.get('since', 0, type=int)
+    return jsonify({'job': job.to_dict(since=max(0, since))})
+
+
+def _sse(event, data, event_id=None):
+    """Mot event Server-Sent Events"""
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+@app.route('/api/jobs/<job_id>/events')
+def api_job_events(job_id):
+    """Stream tien do batch job (text/event-stream)
+
+    Moi URL xong la mot event `result` (id = so URL da xong) kem dem
+    done / success / failed; event `done` khi job ket thuc. Noi lai tu
+    Last-Event-ID (hoac ?since=) chi nhan cac ket qua con thieu.
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Khong tim thay job'}), 404
+
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', 0, type=int)
+    since = max(0, since)
+
+    def generate():
+        sent = since
+        # Dem thanh cong / loi cua cac ket qua client da nhan
+        before = job.to_dict()['results'][:sent]
+        success = sum(1 for entry in before if entry.get('success'))
+        failed = len(before) - success
+        deadline = time.monotonic() + JOB_EVENTS_MAX_SECONDS
+        yield 'retry: 2000\n\n'
+
+        while True:
+            if not job.wait(sent, timeout=JOB_EVENTS_KEEPALIVE):
+                if time.monotonic() >= deadline:
+                    return
+                # Comment: giu ket noi qua proxy va phat hien client da dong tab
+                yield ': keep-alive\n\n'
+                continue
+
+            progress = job.to_dict(since=sent)
+            for entry in progress['results']:
+                sent += 1
+                if entry.get('success'):
+                    success += 1
+                else:
+                    failed += 1
+                yield _sse('result', {**entry, 'done': sent, 'total': progress['total'],
+                                      'success_count': success, 'failed_count': failed}, sent)
+
+            if progress['status'] == 'done' and sent >= progress['done']:
+                del progress['results']
+                yield _sse('done', progress, sent)
+                return
+            if time.monotonic() >= deadline:
+                return
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/refresh')
+def api_refresh():
+    """Trang thai scheduler crawl lai va cac san pham sap duoc crawl"""
+    limit = min(max(request.args.get('limit', 20, type=int), 1), PRODUCTS_MAX_LIMIT)
+    return jsonify({'scheduler': refresh_scheduler.status(),
+                    'next': pick_stale_products(limit, refresh_scheduler.min_age_hours)})
 
-    return product
 
+@app.route('/api/products')
+def api_products():
+    """API lay danh sach san pham da crawl
 
-def parse_price(price_text):
-    """Chuyen doi text gia thanh so"""
-    numbers = re.sub(r'[^\d]', '', price_text)
-    return int(numbers) if numbers else 0
+    Query params: limit, cursor (next_cursor cua trang truoc), brand,
+    min_price, max_price, in_stock, skus (phan cach dau phay), spec.*
+    (xem spec_filters) va fields (cot can lay; specs chi decode khi duoc
+    yeu cau).
+    """
+    args = request.args
+    limit = min(max(args.get('limit', PRODUCTS_PAGE_SIZE, type=int), 1), PRODUCTS_MAX_LIMIT)
 
+    try:
+        fields = parse_fields(args)
+    except ValueError as e:
+        return jsonify({'error': f'Truong khong hop le: {e}'}), 400
+
+    where, params = product_filters(args)
+
+    # Keyset pagination theo (created_at, id) - dung index, khong OFFSET
+    if args.get('cursor'):
+        try:
+            cursor_created, cursor_id = decode_cursor(args['cursor'])
+        except ValueError:
+            return jsonify({'error': 'cursor khong hop le'}), 400
+        where.append('(created_at < ? OR (created_at = ? AND id < ?))')
+        params.extend([cursor_created, cursor_created, cursor_id])
+
+    columns = list(dict.fromkeys(fields + ['id', 'created_at']))
+    sql = f"SELECT {', '.join(columns)} FROM products"
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
 
-def extract_brand(name):
-    """Lay brand tu ten san pham"""
-    brands = ['Dell', 'HP', 'Lenovo', 'Asus', 'Acer', 'MSI', 'Apple', 'MacBook',
-              'Samsung', 'LG', 'Huawei', 'Microsoft', 'Gigabyte', 'Razer', 'iPhone',
-              'iPad', 'Xiaomi', 'OPPO', 'Vivo', 'Realme', 'Sony', 'JBL', 'Marshall']
-    name_lower = name.lower()
-    for brand in brands:
-        if brand.lower() in name_lower:
-            return brand
-    return ''
+    conn = get_db()
+    rows = conn.execute(sql, params + [limit + 1]).fetchall()
 
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
 
-def save_product(product):
-    """Luu san pham vao database"""
-    conn = get_db()
-    try:
-        conn.execute('''
-            INSERT OR REPLACE INTO products
-            (sku, name, brand, price, original_price, discount, image, url, in_stock, specs, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            product['sku'],
-            product['name'],
-            product['brand'],
-            product['price'],
-            product['original_price'],
-            product['discount'],
-            product['image'],
-            product['url'],
-            product['in_stock'],
-            json.dumps(product['specs'], ensure_ascii=False),
-            datetime.now()
-        ))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error saving product: {e}")
-        return False
-    finally:
-        conn.close()
-
-
-def log_crawl(url, status, message=''):
-    """Ghi log crawl"""
-    conn = get_db()
-    conn.execute('INSERT INTO crawl_history (url, status, message) VALUES (?, ?, ?)',
-                 (url, status, message))
-    conn.commit()
-    conn.close()
+    return jsonify({'products': [row_to_product(row, fields) for row in rows], 'next_cursor': next_cursor})
 
 
-# Routes
-@app.route('/')
-def index():
-    """Trang chu"""
-    return render_template('index.html')
+def parse_fields(args, default=PRODUCT_FIELDS):
+    """Danh sach cot tu param fields; raise ValueError neu co cot la"""
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()] or default
+    unknown = [f for f in fields if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise ValueError(', '.join(unknown))
+    return fields
 
 
-@app.route('/api/crawl', methods=['POST'])
-def api_crawl():
-    """API crawl san pham"""
-    data = request.json
-    url = data.get('url', '').strip()
+def row_to_product(row, fields):
+    """Lay cac cot can tra ve, decode specs neu co"""
+    product = {f: row[f] for f in fields}
+    if 'specs' in product:
+        product['specs'] = json.loads(product['specs']) if product['specs'] else {}
+    return product
 
-    if not url:
-        return jsonify({'success': False, 'error': 'Vui long nhap URL san pham'})
 
-    # Crawl san pham
-    result = crawl_cellphones_product(url)
+@app.route('/api/search')
+def api_search():
+    """Tim san pham theo ten / hang / thong so (FTS5, khong phan biet dau)
 
-    if 'error' in result:
-        log_crawl(url, 'error', result['error'])
-        return jsonify({'success': False, 'error': result['error']})
+    Query params: q, limit, offset, fields va cac filter cua /api/products.
+    Ket qua xep theo do lien quan (bm25, ten nang hon hang va thong so).
+    """
+    args = request.args
+    match = fts_query(args.get('q', ''))
+    if not match:
+        return jsonify({'error': 'Vui long nhap tu khoa (q)'}), 400
 
-    # Luu vao database
-    save_product(result)
-    log_crawl(url, 'success')
+    limit = min(max(args.get('limit', PRODUCTS_PAGE_SIZE, type=int), 1), PRODUCTS_MAX_LIMIT)
+    offset = max(args.get('offset', 0, type=int), 0)
+    try:
+        fields = parse_fields(args, SEARCH_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': f'Truong khong hop le: {e}'}), 400
+
+    where, params = product_filters(args)
+    hits = '''
+        SELECT rowid AS hit_id, bm25(products_fts, 10.0, 5.0, 1.0) AS score
+        FROM products_fts WHERE products_fts MATCH ?
+    '''
+    page = ' ORDER BY score LIMIT ? OFFSET ?'
+    # Khong co filter thi cat trang ngay trong FTS, chi join so dong can tra
+    sql = f"WITH hits AS ({hits}{'' if where else page}) " \
+          f"SELECT {', '.join(fields)}, score FROM hits JOIN products ON products.id = hits.hit_id"
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where) + page
+        params = [match] + params + [limit + 1, offset]
+    else:
+        sql += ' ORDER BY score'
+        params = [match, limit + 1, offset]
+
+    rows = get_db().execute(sql, params).fetchall()
+    next_offset = offset + limit if len(rows) > limit else None
+    return jsonify({'products': [row_to_product(row, fields) for row in rows[:limit]],
+                    'next_offset': next_offset})
+
+
+def fts_query(text):
+    """Chuyen chuoi nguoi dung nhap thanh bieu thuc MATCH an toan
+
+    Moi tu la mot term (AND), tu cuoi tim theo tien to de goi y khi dang go;
+    bo dau va 'đ' giong luc index nen "man hinh" khop "màn hình".
+    """
+    terms = re.findall(r'\w+', strip_accents(text).lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        return ''
+    return ' '.join(f'"{t}"' for t in terms) + '*'
+
+
+def product_filters(args):
+    """Dieu kien WHERE tu query params (brand, gia, in_stock, skus, spec.*)"""
+    where, params = [], []
+    if args.get('brand'):
+        where.append('brand = ?')
+        params.append(args['brand'])
+    if args.get('min_price', type=int) is not None:
+        where.append('price >= ?')
+        params.append(args.get('min_price', type=int))
+    if args.get('max_price', type=int) is not None:
+        where.append('price <= ?')
+        params.append(args.get('max_price', type=int))
+    if args.get('in_stock') in ('0', '1', 'true', 'false'):
+        where.append('in_stock = ?')
+        params.append(1 if args['in_stock'] in ('1', 'true') else 0)
+    if args.get('skus'):
+        skus = [s for s in args['skus'].split(',') if s][:PRODUCTS_MAX_LIMIT]
+        where.append(f"sku IN ({', '.join('?' * len(skus))})")
+        params.extend(skus)
+    for key_norm, conditions in spec_filters(args).items():
+        sql = ' AND '.join(cond for cond, _ in conditions)
+        where.append(f'id IN (SELECT product_id FROM specs WHERE key_norm = ? AND {sql})')
+        params.append(key_norm)
+        params.extend(value for _, value in conditions)
+    return where, params
+
+
+def spec_filters(args):
+    """Loc theo thong so: spec.<key>=<gia tri>, spec.<key>.min / .max (so da
+    quy doi), spec.<key>.contains; key chuan hoa nhu bang specs (vd spec.ram.min=16)
+
+    Tra ve {key_norm: [(dieu kien, tham so)]} - cac dieu kien cung key gop vao
+    mot subquery de dung index (key_norm, value_num) / (key_norm, value_norm).
+    """
+    filters = {}
+    for name, value in args.items():
+        if not name.startswith('spec.') or value == '':
+            continue
+        key, _, op = name[len('spec.'):].rpartition('.')
+        if op not in SPEC_FILTER_OPS:
+            key, op = name[len('spec.'):], 'eq'
+        if op in ('min', 'max'):
+            try:
+                value = float(value)
+            except ValueError:
+                continue
+        elif op == 'contains':
+            value = f'%{normalize_spec_value(value)}%'
+        else:
+            value = normalize_spec_value(value)
+        filters.setdefault(normalize_spec_key(key), []).append((SPEC_FILTER_OPS[op], value))
+    return filters
+
+
+@app.route('/api/specs')
+def api_spec_keys():
+    """Cac key thong so (da chuan hoa) va so san pham co key do"""
+    rows = get_db().execute('''
+        SELECT key_norm, MIN(spec_key) AS spec_key, COUNT(DISTINCT product_id) AS products,
+               COUNT(value_num) AS numeric
+        FROM specs GROUP BY key_norm ORDER BY products DESC, key_norm
+    ''').fetchall()
+    return jsonify({'specs': [dict(row) for row in rows]})
+
+
+@app.route('/api/specs/<key>')
+def api_spec_values(key):
+    """Phan bo gia tri cua mot key thong so (de lam bo loc)"""
+    key_norm = normalize_spec_key(key)
+    limit = min(max(request.args.get('limit', 100, type=int), 1), PRODUCTS_MAX_LIMIT)
+    conn = get_db()
+    values = conn.execute('''
+        SELECT value_norm, MIN(spec_value) AS spec_value, MIN(value_num) AS value_num,
+               COUNT(*) AS products
+        FROM specs WHERE key_norm = ? GROUP BY value_norm
+        ORDER BY products DESC, value_norm LIMIT ?
+    ''', (key_norm, limit)).fetchall()
+    if not values:
+        return jsonify({'error': 'Khong tim thay thong so'}), 404
 
-    return jsonify({'success': True, 'product': result})
+    bounds = conn.execute('SELECT MIN(value_num) AS min, MAX(value_num) AS max FROM specs WHERE key_norm = ?',
+                          (key_norm,)).fetchone()
+    return jsonify({'key': key_norm, 'min': bounds['min'], 'max': bounds['max'],
+                    'values': [dict(row) for row in values]})
 
 
-@app.route('/api/products')
-def api_products():
-    """API lay danh sach san pham da crawl"""
-    conn = get_db()
-    products = conn.execute('SELECT * FROM products ORDER BY created_at DESC').fetchall()
-    conn.close()
+def encode_cursor(created_at, product_id):
+    """Cursor dang chuoi an (base64) tu (created_at, id)"""
+    raw = json.dumps([created_at, product_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
 
-    result = []
-    for p in products:
-        product = dict(p)
-        product['specs'] = json.loads(product['specs']) if product['specs'] else {}
-        result.append(product)
 
-    return jsonify({'products': result})
+def decode_cursor(cursor):
+    """Nguoc lai cua encode_cursor, raise ValueError neu sai"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, product_id = json.loads(raw)
+        return str(created_at), int(product_id)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError(cursor)
+
+
+@app.route('/api/export.csv')
+def api_export_csv():
+    """Export CSV stream truc tiep tu SQLite (bo nho server khong doi theo so san pham)
+
+    Nhan cung filter voi /api/products. Cot thong so lay tu bang spec_keys.
+    """
+    where, params = product_filters(request.args)
+    spec_keys = get_spec_keys()
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+        buffer.write('\ufeff')
+        writer.writerow(EXPORT_COLUMNS + spec_keys)
+
+        for index, row in enumerate(iter_export_rows(where, params), start=1):
+            specs = json.loads(row['specs']) if row['specs'] else {}
+            writer.writerow([index] + [row[c] if row[c] is not None else '' for c in EXPORT_FIELDS]
+                            + [specs.get(key, '').replace('\n', ' | ') for key in spec_keys])
+            # Day ra tung cum ~64KB
+            if buffer.tell() > 65536:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    filename = f"cellphones_all_{datetime.now().strftime('%Y-%m-%d')}.csv"
+    return Response(generate(), mimetype='text/csv; charset=utf-8',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+@app.route('/api/export.parquet')
+def api_export_parquet():
+    """Export Parquet (can pyarrow), ghi tung row group ra file tam roi stream"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return jsonify({'error': 'Can cai pyarrow de export Parquet'}), 501
+
+    where, params = product_filters(request.args)
+    spec_keys = get_spec_keys()
+    columns = EXPORT_FIELDS + spec_keys
+    schema = pa.schema([(c, pa.int64() if c in ('price', 'original_price', 'in_stock') else pa.string())
+                        for c in EXPORT_FIELDS] + [(key, pa.string()) for key in spec_keys])
+
+    tmp = tempfile.TemporaryFile()
+    with pq.ParquetWriter(tmp, schema) as writer:
+        batch = []
+        for row in iter_export_rows(where, params):
+            specs = json.loads(row['specs']) if row['specs'] else {}
+            batch.append([row[c] for c in EXPORT_FIELDS] + [specs.get(key) for key in spec_keys])
+            if len(batch) >= 5000:
+                writer.write_table(pa.Table.from_pylist([dict(zip(columns, r)) for r in batch], schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist([dict(zip(columns, r)) for r in batch], schema))
+    tmp.seek(0)
+
+    def generate():
+        with tmp:
+            while chunk := tmp.read(65536):
+                yield chunk
+
+    filename = f"cellphones_all_{datetime.now().strftime('%Y-%m-%d')}.parquet"
+    return Response(generate(), mimetype='application/octet-stream',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+def iter_export_rows(where, params):
+    """Duyet san pham theo cursor SQLite, khong nap het vao bo nho"""
+    sql = f"SELECT {', '.join(EXPORT_FIELDS)}, specs FROM products"
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY created_at DESC, id DESC'
+    return get_db().execute(sql, params)
 
 
 @app.route('/api/products/<sku>')
@@ -298,7 +509,6 @@ def api_product_detail(sku):
     """API lay chi tiet san pham"""
     conn = get_db()
     product = conn.execute('SELECT * FROM products WHERE sku = ?', (sku,)).fetchone()
-    conn.close()
 
     if not product:
         return jsonify({'error': 'Khong tim thay san pham'}), 404
@@ -309,13 +519,23 @@ def api_product_detail(sku):
     return jsonify({'product': result})
 
 
+@app.route('/api/products/<sku>/history')
+def api_product_history(sku):
+    """API lich su gia san pham (moi dong la mot lan gia / ton kho thay doi)"""
+    limit = request.args.get('limit', type=int)
+    history = get_price_history(sku, max(limit, 1) if limit else None)
+    if history is None:
+        return jsonify({'error': 'Khong tim thay san pham'}), 404
+
+    return jsonify({'sku': sku, 'history': history})
+
+
 @app.route('/api/products/<sku>', methods=['DELETE'])
 def api_delete_product(sku):
     """API xoa san pham"""
     conn = get_db()
     conn.execute('DELETE FROM products WHERE sku = ?', (sku,))
     conn.commit()
-    conn.close()
 
     return jsonify({'success': True})
 
@@ -324,14 +544,26 @@ def api_delete_product(sku):
 def api_history():
     """API lay lich su crawl"""
     conn = get_db()
-    history = conn.execute('SELECT * FROM crawl_history ORDER BY created_at DESC LIMIT 50').fetchall()
-    conn.close()
+    history = [dict(h) for h in conn.execute('SELECT * FROM crawl_history ORDER BY created_at DESC LIMIT 50')]
+    for h in history:
+        h['timings'] = json.loads(h['timings']) if h['timings'] else None
 
-    return jsonify({'history': [dict(h) for h in history]})
+    return jsonify({'history': history})
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metric dang Prometheus: so lan crawl / loi, histogram thoi gian tung buoc"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 
 # Init database on import (for Gunicorn)
 init_db()
 
+# Chay tiep batch job dang do truoc khi restart (bo qua process cha cua reloader)
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN'):
+    job_manager.resume()
+    refresh_scheduler.start()
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
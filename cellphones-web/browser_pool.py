@@ -0,0 +1,56 @@
+"""
+Pool trinh duyet Chromium dung chung cho Flask process
+
+CrawlEngine (async) chay tren mot event loop rieng trong thread nen. Route
+Flask va batch job goi browser_pool.run(coro) de cho ket qua dong bo; so tab
+mo cung luc duoc gioi han boi semaphore cua engine.
+"""
+
+import asyncio
+import os
+import threading
+
+from crawl_engine import CrawlEngine, PAGES_PER_CONTEXT
+
+
+# So tab crawl song song trong mot Chromium
+POOL_SIZE = int(os.environ.get('BROWSER_POOL_SIZE', '4'))
+
+
+class BrowserPool:
+    """Giu Chromium am tren event loop rieng, cho thread khac muon tab"""
+
+    def __init__(self, size=POOL_SIZE, pages_per_context=PAGES_PER_CONTEXT):
+        self.size = max(1, size)
+        self.engine = CrawlEngine(concurrency=self.size, pages_per_context=pages_per_context)
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Khoi dong event loop thread (chi chay mot lan)"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='browser-pool', daemon=True)
+            self._thread.start()
+
+    def run(self, coro):
+        """Chay coroutine (vd engine.fetch_product(url)) tren loop cua pool va doi ket qua"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self):
+        """Dong browser va dung event loop"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+            thread, self._thread = self._thread, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.engine.close(), loop).result(timeout=30)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=30)
@@ -0,0 +1,403 @@
+"""
+Async crawl engine cho CellphoneS (playwright.async_api)
+
+Mot Chromium, nhieu tab chay song song - so tab gioi han boi semaphore.
+Dung chung cho CLI crawl_cellphones.py va Flask app (qua BrowserPool).
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright
+
+from product_parser import (
+    IMG_SELECTORS, MODAL_SELECTOR, ORIGINAL_PRICE_SELECTORS, PRICE_SELECTORS, SPEC_TABLE_SELECTOR,
+    calc_discount, extract_brand, extract_sku_from_url, parse_price,
+)
+from crawl_errors import status_error
+from metrics import record, timed
+from rate_limit import limiter
+from snapshots import HTML, MODAL, SNAPSHOTS, save_snapshot
+
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# So tab song song va so page truoc khi tao lai context
+CONCURRENCY = int(os.environ.get('CRAWL_CONCURRENCY', '8'))
+PAGES_PER_CONTEXT = int(os.environ.get('BROWSER_PAGES_PER_CONTEXT', '50'))
+
+# Cho den DOMContentLoaded roi doi selector cu the, khong doi networkidle
+WAIT_UNTIL = os.environ.get('PAGE_WAIT_UNTIL', 'domcontentloaded')
+NAV_TIMEOUT = int(os.environ.get('PAGE_NAV_TIMEOUT', '60000'))
+
+# Loai request bi chan (anh/video/font khong can de doc DOM) - chuoi rong = tat
+BLOCK_RESOURCES = [t for t in os.environ.get('BLOCK_RESOURCES', 'image,media,font').split(',') if t]
+
+# Tracker / quang cao bo qua, them domain qua BLOCK_DOMAINS
+BLOCK_DOMAINS = [
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googleadservices.com',
+    'googlesyndication.com', 'facebook.net', 'facebook.com', 'analytics.tiktok.com',
+    'hotjar.com', 'clarity.ms', 'criteo.com', 'criteo.net', 'adnxs.com', 'zalo.me',
+    'useinsider.com', 'onesignal.com',
+] + [d for d in os.environ.get('BLOCK_DOMAINS', '').split(',') if d]
+
+SHOW_MORE_SELECTOR = '.btn-show-more, .button__show-more-product'
+MODAL_ROW_SELECTOR = ', '.join(f'{sel.strip()} tr' for sel in MODAL_SELECTOR.split(','))
+
+# Doc toan bo san pham trong mot lan goi vao browser thay vi hang tram
+# lan query_selector / inner_text (moi lan la mot round trip IPC)
+EXTRACT_PRODUCT_JS = """
+(sel) => {
+    const text = el => (el ? el.innerText : '').trim();
+    const firstPrice = selectors => {
+        for (const s of selectors) {
+            const el = document.querySelector(s);
+            if (el && Number(el.innerText.replace(/[^0-9]/g, '')) > 0) return el.innerText;
+        }
+        return '';
+    };
+    const firstImage = () => {
+        for (const s of sel.img) {
+            const el = document.querySelector(s);
+            if (!el) continue;
+            const src = el.getAttribute('src') || el.getAttribute('data-src');
+            // Bo qua youtube thumbnail
+            if (src && !src.includes('youtube') && !src.includes('data:image')) return src;
+        }
+        return '';
+    };
+    const readRows = rows => {
+        const specs = [];
+        for (const row of rows) {
+            const cols = row.querySelectorAll('td');
+            if (cols.length < 2) continue;
+            const key = text(cols[0]), value = text(cols[1]);
+            if (key && value) specs.push([key, value]);
+        }
+        return specs;
+    };
+
+    let specs = [];
+    const modal = document.querySelector(sel.modal);
+    if (modal) specs = readRows(modal.querySelectorAll('tr'));
+    // Neu khong lay duoc tu modal, lay tu trang chinh
+    if (!specs.length) specs = readRows(document.querySelectorAll(sel.specTable));
+
+    return {
+        name: text(document.querySelector('h1')),
+        price_text: firstPrice(sel.price),
+        original_text: firstPrice(sel.original),
+        image: firstImage(),
+        specs: specs,
+    };
+}
+"""
+
+EXTRACT_LISTING_JS = """
+(limit) => {
+    const text = el => (el ? el.innerText : '');
+    const items = [];
+    for (const card of document.querySelectorAll('.product-info-container')) {
+        if (limit && items.length >= limit) break;
+        const link = card.querySelector('a.product__link');
+        if (!link) continue;
+        const img = card.querySelector('.product__img');
+        items.push({
+            url: link.getAttribute('href'),
+            name: text(card.querySelector('.product__name h3')),
+            image: img ? img.getAttribute('src') || '' : '',
+            price_text: text(card.querySelector('.product__price--show')) || '0',
+            original_text: text(card.querySelector('.product__price--through')),
+            discount: text(card.querySelector('.product__price--percent-detail span')),
+        });
+    }
+    return items;
+}
+"""
+
+_SELECTOR_ARGS = {
+    'price': PRICE_SELECTORS,
+    'original': ORIGINAL_PRICE_SELECTORS,
+    'img': IMG_SELECTORS,
+    'modal': MODAL_SELECTOR,
+    'specTable': SPEC_TABLE_SELECTOR,
+}
+
+
+class CrawlEngine:
+    """Giu mot Chromium, cho muon tab theo semaphore"""
+
+    def __init__(self, concurrency=CONCURRENCY, pages_per_context=PAGES_PER_CONTEXT, headless=True,
+                 block_resources=BLOCK_RESOURCES, block_domains=BLOCK_DOMAINS):
+        self.concurrency = max(1, concurrency)
+        self.pages_per_context = max(1, pages_per_context)
+        self.headless = headless
+        self.block_resources = set(block_resources)
+        self.block_domains = tuple(block_domains)
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._context_pages = 0
+        self._open_pages = {}
+        self._semaphore = None
+        self._lock = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        """Khoi dong Playwright + Chromium (goi lai khong sao)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            await self._ensure_browser()
+
+    async def close(self):
+        """Dong browser va Playwright"""
+        if self._browser is not None:
+            await _close_quietly(self._browser)
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        self._context = None
+        self._open_pages = {}
+        self._semaphore = None
+        self._lock = None
+
+    @asynccontextmanager
+    async def page(self):
+        """Muon mot tab moi; tu dong dong tab va tao lai context khi can"""
+        if self._semaphore is None:
+            await self.start()
+        async with self._semaphore:
+            context = await self._acquire_context()
+            ok = False
+            page = None
+            try:
+                page = await context.new_page()
+                yield page
+                ok = True
+            finally:
+                if page is not None:
+                    await _close_quietly(page)
+                await self._release_context(context, ok)
+
+    async def fetch_product(self, url, timings=None):
+        """Crawl trang chi tiet, tra ve dict san pham
+
+        `timings` (dict, tuy chon) nhan thoi gian tung buoc theo ms.
+        """
+        start = time.perf_counter()
+        async with self.page() as page:
+            record(timings, 'browser_acquire', time.perf_counter() - start)
+            with timed(timings, 'navigation'):
+                await goto(page, url)
+                await page.wait_for_selector('h1', timeout=30000)
+                await _wait_optional(page, ', '.join(PRICE_SELECTORS))
+            return await extract_product(page, url, timings)
+
+    async def fetch_specs(self, url):
+        """Crawl trang chi tiet, chi lay thong so ky thuat"""
+        async with self.page() as page:
+            await goto(page, url)
+            await page.wait_for_selector('.technical-content', timeout=10000)
+            return await extract_specs(page, url)
+
+    async def fetch_listing(self, url, limit=None):
+        """Crawl trang danh sach, tra ve thong tin co ban tung san pham"""
+        async with self.page() as page:
+            await goto(page, url)
+            await page.wait_for_selector('.product-info-container', timeout=30000)
+            await load_more_listing(page, limit)
+            return await extract_listing(page, limit)
+
+    async def _ensure_browser(self):
+        """Mo (lai) Chromium neu chua co hoac da crash"""
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        if self._browser is None or not self._browser.is_connected():
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._context = None
+            self._open_pages = {}
+
+    async def _acquire_context(self):
+        """Lay context dang dung, tao moi sau N page"""
+        async with self._lock:
+            await self._ensure_browser()
+            if self._context is None or self._context_pages >= self.pages_per_context:
+                old = self._context
+                self._context = await self._browser.new_context(user_agent=USER_AGENT)
+                if self.block_resources or self.block_domains:
+                    await self._context.route('**/*', self._filter_request)
+                self._context_pages = 0
+                self._open_pages[self._context] = 0
+                if old is not None and self._open_pages.get(old) == 0:
+                    self._open_pages.pop(old, None)
+                    await _close_quietly(old)
+            self._context_pages += 1
+            self._open_pages[self._context] += 1
+            return self._context
+
+    async def _filter_request(self, route):
+        """Chan anh/video/font va tracker, cho cac request con lai di tiep"""
+        request = route.request
+        host = urlparse(request.url).hostname or ''
+        blocked_host = any(host == d or host.endswith('.' + d) for d in self.block_domains)
+        if request.resource_type in self.block_resources or blocked_host:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _release_context(self, context, ok):
+        """Tra tab; context loi hoac da het luot thi dong khi khong con tab"""
+        async with self._lock:
+            if context not in self._open_pages:
+                return
+            self._open_pages[context] -= 1
+            if not ok and context is self._context:
+                # Context co the da hong, lan sau tao moi
+                self._context = None
+            if context is not self._context and self._open_pages[context] == 0:
+                self._open_pages.pop(context, None)
+                await _close_quietly(context)
+
+
+async def extract_product(page, url, timings=None):
+    """Lay thong tin san pham tu trang chi tiet da load (1 lan page.evaluate)"""
+    await snapshot_page(page, url)
+    with timed(timings, 'modal_click'):
+        await open_spec_modal(page)
+    await snapshot_modal(page, url)
+    with timed(timings, 'extraction'):
+        data = await page.evaluate(EXTRACT_PRODUCT_JS, _SELECTOR_ARGS)
+
+    product = {'name': data['name']}
+    product['price'] = parse_price(data['price_text'])
+    original_price = parse_price(data['original_text'])
+    product['original_price'] = original_price if original_price > 0 else product['price']
+    product['discount'] = calc_discount(product['price'], product['original_price'])
+    product['image'] = data['image']
+    product['sku'] = extract_sku_from_url(url)
+    product['url'] = url
+    product['brand'] = extract_brand(product['name'])
+    product['in_stock'] = True
+    product['specs'] = dict(data['specs'])
+
+    return product
+
+
+async def extract_specs(page, url=None):
+    """Lay TAT CA thong so bang cach click nut 'Xem tat ca', fallback trang chinh"""
+    if url:
+        await snapshot_page(page, url)
+    await open_spec_modal(page)
+    if url:
+        await snapshot_modal(page, url)
+    data = await page.evaluate(EXTRACT_PRODUCT_JS, _SELECTOR_ARGS)
+    return dict(data['specs'])
+
+
+async def snapshot_page(page, url):
+    """Luu DOM trang (truoc khi mo modal) de parse lai offline"""
+    if SNAPSHOTS:
+        await asyncio.to_thread(save_snapshot, url, HTML, await page.content())
+
+
+async def snapshot_modal(page, url):
+    """Luu outerHTML modal thong so (neu co)"""
+    if SNAPSHOTS:
+        modal = await page.evaluate('sel => { const m = document.querySelector(sel); return m ? m.outerHTML : null; }',
+                                    MODAL_SELECTOR)
+        await asyncio.to_thread(save_snapshot, url, MODAL, modal)
+
+
+async def open_spec_modal(page):
+    """Click nut 'Xem tat ca' va doi modal co dong thong so"""
+    show_all_btn = await page.query_selector('.button__show-modal-technical')
+    if show_all_btn:
+        await show_all_btn.click()
+        # Doi modal hien ra (co dong thong so) thay vi sleep co dinh
+        await _wait_optional(page, MODAL_ROW_SELECTOR, timeout=5000)
+
+
+async def load_more_listing(page, limit=None, max_clicks=50):
+    """Bam 'Xem them' den khi du `limit` san pham (None = het danh muc)"""
+    for _ in range(max_clicks):
+        count = len(await page.query_selector_all('.product-info-container'))
+        if limit and count >= limit:
+            return
+        button = await page.query_selector(SHOW_MORE_SELECTOR)
+        if not button or not await button.is_visible():
+            return
+        await button.click()
+        try:
+            await page.wait_for_function(
+                'n => document.querySelectorAll(".product-info-container").length > n',
+                arg=count, timeout=15000)
+        except Exception:
+            return
+
+
+async def extract_listing(page, limit=None):
+    """Lay thong tin co ban tu cac the san pham tren trang danh sach"""
+    cards = await page.evaluate(EXTRACT_LISTING_JS, limit or 0)
+
+    items = []
+    for card in cards:
+        price = parse_price(card['price_text'])
+        items.append({
+            'url': card['url'],
+            'name': card['name'],
+            'image': card['image'],
+            'price': price,
+            'original_price': parse_price(card['original_text']) if card['original_text'] else price,
+            'discount': f"-{card['discount']}" if card['discount'] else '',
+        })
+
+    return items
+
+
+async def goto(page, url):
+    """page.goto qua rate limiter chung (cung bucket voi duong HTTP)
+
+    Raise CrawlError khi trang tra 404 / bi chan thay vi doi selector den het gio.
+    """
+    await limiter.wait_async(url)
+    start = time.monotonic()
+    try:
+        response = await page.goto(url, wait_until=WAIT_UNTIL, timeout=NAV_TIMEOUT)
+    except Exception:
+        limiter.report(url, None, time.monotonic() - start)
+        raise
+    if response is not None:
+        limiter.report(url, response.status, time.monotonic() - start, response.headers.get('retry-after'))
+        error = status_error(response.status, url)
+        if error:
+            raise error
+    return response
+
+
+async def _wait_optional(page, selector, timeout=10000):
+    """Doi selector xuat hien; het gio thi bo qua (se thu selector du phong)"""
+    try:
+        await page.wait_for_selector(selector, timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+
+async def _close_quietly(target):
+    """Dong page/context/browser, bo qua loi neu da chet"""
+    try:
+        await target.close()
+    except Exception:
+        pass
@@ -0,0 +1,107 @@
+"""
+Phan loai loi crawl va thu lai co backoff
+
+Loi tam thoi (timeout, bi chan, loi mang / server) duoc thu lai voi thoi
+gian cho tang theo cap so nhan co jitter; loi co dinh (404, khong doc duoc
+du lieu, URL sai) tra ve ngay. Loai loi duoc ghi vao crawl_history.
+"""
+
+import asyncio
+import os
+import random
+import time
+
+import requests
+
+
+TIMEOUT = 'timeout'
+BLOCKED = 'blocked'
+NOT_FOUND = 'not_found'
+PARSE_MISS = 'parse_miss'
+NETWORK = 'network'
+INVALID = 'invalid'
+UNKNOWN = 'error'
+
+TRANSIENT = {TIMEOUT, BLOCKED, NETWORK}
+
+BLOCKED_STATUSES = (403, 429, 503)
+NOT_FOUND_STATUSES = (404, 410)
+
+# So lan thu lai (ngoai lan dau) va thoi gian cho co so / toi da (giay)
+CRAWL_RETRIES = int(os.environ.get('CRAWL_RETRIES', '2'))
+RETRY_BASE_DELAY = float(os.environ.get('RETRY_BASE_DELAY', '1'))
+RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', '30'))
+
+
+class CrawlError(Exception):
+    """Loi crawl da phan loai (kind la mot trong cac hang o tren)"""
+
+    def __init__(self, kind, message=''):
+        super().__init__(message or kind)
+        self.kind = kind
+        self.attempts = 1
+
+    @property
+    def transient(self):
+        return self.kind in TRANSIENT
+
+
+def status_error(status, url=''):
+    """CrawlError theo HTTP status (None neu status khong phai loi)"""
+    if status in NOT_FOUND_STATUSES:
+        return CrawlError(NOT_FOUND, f'HTTP {status}: {url}')
+    if status in BLOCKED_STATUSES:
+        return CrawlError(BLOCKED, f'HTTP {status}: {url}')
+    if status >= 500:
+        return CrawlError(NETWORK, f'HTTP {status}: {url}')
+    if status >= 400:
+        return CrawlError(UNKNOWN, f'HTTP {status}: {url}')
+    return None
+
+
+def classify(exc):
+    """Chuyen exception bat ky (requests / Playwright / asyncio) thanh CrawlError"""
+    if isinstance(exc, CrawlError):
+        return exc
+    # Playwright TimeoutError khong ke thua TimeoutError cua Python
+    if isinstance(exc, (requests.Timeout, TimeoutError)) or type(exc).__name__ == 'TimeoutError':
+        return CrawlError(TIMEOUT, str(exc))
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return status_error(exc.response.status_code, exc.response.url) or CrawlError(UNKNOWN, str(exc))
+    if isinstance(exc, requests.ConnectionError) or 'net::ERR_' in str(exc):
+        return CrawlError(NETWORK, str(exc))
+    return CrawlError(UNKNOWN, str(exc))
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Full jitter: ngau nhien trong [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def with_retries(fn, *args, retries=CRAWL_RETRIES, **kwargs):
+    """Goi fn, thu lai khi loi tam thoi; raise CrawlError (co .attempts) neu van loi
+
+    Tra ve (ket qua, so lan da goi).
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs), attempt + 1
+        except Exception as e:
+            error = classify(e)
+            error.attempts = attempt + 1
+            if not error.transient or attempt == retries:
+                raise error from e
+        time.sleep(backoff_delay(attempt))
+
+
+async def with_retries_async(fn, *args, retries=CRAWL_RETRIES, **kwargs):
+    """Nhu with_retries cho coroutine function"""
+    for attempt in range(retries + 1):
+        try:
+            return await fn(*args, **kwargs), attempt + 1
+        except Exception as e:
+            error = classify(e)
+            error.attempts = attempt + 1
+            if not error.transient or attempt == retries:
+                raise error from e
+        await asyncio.sleep(backoff_delay(attempt))
@@ -0,0 +1,136 @@
+"""
+Trang thai crawl ben vung (checkpoint / resume) trong SQLite
+
+Moi job co mot hang doi URL voi trang thai pending / done / failed. Khi
+process chet hoac container restart, crawl chay lai se bo qua URL da xong
+va chi thu lai URL con pending hoac failed.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+STATE_DATABASE = os.environ.get('CRAWL_STATE_DB', 'crawl_state.db')
+
+
+class CrawlState:
+    """Hang doi URL theo job, luu trong file SQLite rieng"""
+
+    def __init__(self, path=STATE_DATABASE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript('''
+            PRAGMA journal_mode=WAL;
+
+            CREATE TABLE IF NOT EXISTS crawl_jobs (
+                id TEXT PRIMARY KEY,
+                source TEXT NOT NULL DEFAULT 'web',
+                status TEXT NOT NULL DEFAULT 'running',
+                concurrency INTEGER,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS crawl_queue (
+                job_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                error TEXT,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (job_id, url)
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_crawl_queue_status ON crawl_queue(job_id, status);
+        ''')
+        self._conn.commit()
+
+    def start_job(self, job_id, urls, concurrency=None, source='web'):
+        """Tao job (hoac mo lai job cu) va them URL chua co vao hang doi
+
+        Job cung id da chay xong (status 'done') thi bat dau hang doi moi: id
+        co dinh cua CLI (vd 'phongvu:catalog') resume duoc o moi lan chay.
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT status FROM crawl_jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is not None and row['status'] == 'done':
+                self._conn.execute('DELETE FROM crawl_queue WHERE job_id = ?', (job_id,))
+            self._conn.execute('''
+                INSERT INTO crawl_jobs (id, source, concurrency) VALUES (?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET status = 'running', updated_at = CURRENT_TIMESTAMP
+            ''', (job_id, source, concurrency))
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO crawl_queue (job_id, url, position) VALUES (?, ?, ?)',
+                [(job_id, url, i) for i, url in enumerate(urls)])
+            self._conn.commit()
+
+    def remaining(self, job_id):
+        """URL chua xong cua job (pending truoc, failed sau), theo thu tu ban dau"""
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT url FROM crawl_queue
+                WHERE job_id = ? AND status != 'done'
+                ORDER BY status = 'failed', position
+            ''', (job_id,)).fetchall()
+        return [row['url'] for row in rows]
+
+    def mark(self, job_id, url, success, error=''):
+        """Ghi ket qua mot URL"""
+        with self._lock:
+            self._conn.execute('''
+                UPDATE crawl_queue
+                SET status = ?, error = ?, attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ? AND url = ?
+            ''', ('done' if success else 'failed', error, job_id, url))
+            self._conn.commit()
+
+    def mark_many(self, job_id, results):
+        """Ghi ket qua nhieu URL trong mot transaction: results = [(url, success, error)]"""
+        with self._lock:
+            self._conn.executemany('''
+                UPDATE crawl_queue
+                SET status = ?, error = ?, attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ? AND url = ?
+            ''', [('done' if success else 'failed', error, job_id, url) for url, success, error in results])
+            self._conn.commit()
+
+    def finish_job(self, job_id):
+        """Danh dau job da chay het hang doi"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE crawl_jobs SET status = 'done', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (job_id,))
+            self._conn.commit()
+
+    def is_unfinished(self, job_id):
+        """Job da bat dau nhung chua chay het hang doi (resume duoc)"""
+        with self._lock:
+            row = self._conn.execute('SELECT status FROM crawl_jobs WHERE id = ?', (job_id,)).fetchone()
+        return row is not None and row['status'] == 'running'
+
+    def counts(self, job_id):
+        """So URL theo trang thai: {'pending': n, 'done': n, 'failed': n}"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT status, COUNT(*) AS n FROM crawl_queue WHERE job_id = ? GROUP BY status',
+                (job_id,)).fetchall()
+        counts = {'pending': 0, 'done': 0, 'failed': 0}
+        counts.update({row['status']: row['n'] for row in rows})
+        return counts
+
+    def unfinished_jobs(self, source='web'):
+        """Cac job dang chay do khi process dung (de resume)"""
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT id, concurrency FROM crawl_jobs
+                WHERE status = 'running' AND source = ? ORDER BY created_at
+            ''', (source,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,131 @@
+"""
+Crawl mot san pham CellphoneS va luu vao SQLite - dung chung cho web app
+va cac worker chay rieng (khong can Flask)
+"""
+
+import atexit
+import time
+
+import database
+from browser_pool import BrowserPool
+from crawl_errors import INVALID, NOT_FOUND, PARSE_MISS, CrawlError, classify, with_retries
+from database import get_fingerprint, get_product_by_url
+from http_client import CRAWL_MODE, fetch_product_conditional
+from metrics import CRAWL_ERRORS, CRAWL_RETRIES, CRAWL_SECONDS, CRAWLS, timed
+from product_parser import content_hash, is_complete
+
+
+# Chromium am dung chung cho moi request (khoi dong lan dau khi crawl)
+browser_pool = BrowserPool()
+atexit.register(browser_pool.close)
+
+
+def crawl_cellphones_product(url, force=False, timings=None):
+    """Crawl thong tin san pham tu CellphoneS (mot lan, khong thu lai)
+
+    Tra ve {'unchanged': True, ...validator} neu trang khong doi so voi lan
+    crawl truoc (304, hoac van tay HTTP trung) - khi do khong mo browser.
+    Loi duoc raise thanh CrawlError da phan loai; thoi gian tung buoc (ms)
+    duoc cong vao `timings` neu co.
+    """
+
+    if 'cellphones.com.vn' not in url:
+        raise CrawlError(INVALID, 'URL khong phai tu CellphoneS')
+
+    # Thu HTTP truoc, chi mo Chromium khi HTML thieu ten / gia / thong so
+    check = {}
+    if CRAWL_MODE != 'browser':
+        stored = None if force else get_fingerprint(url)
+        # San pham luu chua co thong so thi khong hoi 304: can ban day du de bo sung
+        cached = stored if stored and stored['has_specs'] else None
+        try:
+            with timed(timings, 'http_fetch'):
+                product, validators = fetch_product_conditional(
+                    url, cached and cached['etag'], cached and cached['last_modified'])
+            if product is None:
+                return {'unchanged': True, **validators}
+
+            check = {'content_hash': content_hash(product), **validators}
+            if stored and stored['has_specs'] and stored['content_hash'] == check['content_hash']:
+                return {'unchanged': True, **check}
+            if CRAWL_MODE == 'http' or is_complete(product):
+                return _require_name({**product, **check})
+        except Exception as e:
+            error = classify(e)
+            # Trang khong ton tai thi mo browser cung vo ich
+            if CRAWL_MODE == 'http' or error.kind == NOT_FOUND:
+                raise error from e
+
+    # Giu van tay cua ban HTTP de lan sau so sanh cung mot cach parse
+    product = browser_pool.run(browser_pool.engine.fetch_product(url, timings))
+    return _require_name({**product, **check})
+
+
+def _require_name(product):
+    if not product.get('name'):
+        raise CrawlError(PARSE_MISS, 'Khong doc duoc ten san pham')
+    return product
+
+
+def crawl_and_save(url, force=False, buffer=None):
+    """Crawl mot URL (thu lai khi loi tam thoi), luu san pham va ghi log + metric"""
+    return store_result(crawl_url(url, force), buffer)
+
+
+def crawl_url(url, force=False):
+    """Crawl mot URL (thu lai khi loi tam thoi) nhung chua ghi database
+
+    Tra ve ban ghi ket qua (pickle duoc) cho store_result - process crawl
+    khong can giu ket noi ghi SQLite, xem crawl_sharded.py.
+    """
+    timings = {}
+    start = time.perf_counter()
+    record = {'url': url, 'timings': timings}
+    try:
+        result, attempts = with_retries(crawl_cellphones_product, url, force, timings=timings)
+    except CrawlError as e:
+        record.update(status='error', error=str(e), error_class=e.kind, attempts=e.attempts)
+    else:
+        record.update(status='unchanged' if result.get('unchanged') else 'success', result=result, attempts=attempts)
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+
+def store_result(record, buffer=None):
+    """Ghi ket qua cua crawl_url vao database + log + metric, tra ve response cho API
+
+    Co `buffer` (WriteBuffer) thi chi xep hang, ghi theo lo tren thread nen.
+    """
+    url, timings, status = record['url'], record['timings'], record['status']
+    # Khong co buffer: ghi ngay, moi dong mot transaction (module database cung interface)
+    writer = buffer or database
+    start = time.perf_counter()
+
+    if status == 'error':
+        _finish(writer, url, status, record['seconds'], timings, record['attempts'], record['error'],
+                record['error_class'])
+        return {'success': False, 'error': record['error'], 'error_class': record['error_class']}
+
+    if status == 'unchanged':
+        with timed(timings, 'db_write'):
+            writer.touch_product(url, record['result'])
+        _finish(writer, url, status, record['seconds'] + time.perf_counter() - start, timings, record['attempts'])
+        return {'success': True, 'unchanged': True, 'product': get_product_by_url(url)}
+
+    # Luu vao database
+    with timed(timings, 'db_write'):
+        writer.save_product(record['result'])
+    _finish(writer, url, status, record['seconds'] + time.perf_counter() - start, timings, record['attempts'])
+
+    return {'success': True, 'product': record['result']}
+
+
+def _finish(writer, url, status, elapsed, timings, attempts, message='', error_class=None):
+    """Cap nhat metric va ghi crawl_history kem thoi gian tung buoc"""
+    CRAWLS.inc(status=status)
+    CRAWL_SECONDS.observe(elapsed, status=status)
+    if attempts > 1:
+        CRAWL_RETRIES.inc(attempts - 1)
+    if error_class:
+        CRAWL_ERRORS.inc(error_class=error_class)
+    writer.log_crawl(url, status, message, error_class, attempts, round(elapsed * 1000), timings)
@@ -0,0 +1,414 @@
+"""
+SQLite cho CellphoneS crawler - connection, schema va ham ghi
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+from product_parser import normalize_spec, strip_accents
+
+
+DATABASE = os.environ.get('DATABASE', 'products.db')
+BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', '5000'))
+
+_local = threading.local()
+
+
+def _fts_columns(row):
+    """Bieu thuc SQL (name, brand, specs dang text) de dua vao products_fts
+
+    unicode61 bo dau nhung khong doi 'đ' -> 'd', nen thay truoc khi index.
+    """
+    exprs = [f'{row}.name', f"coalesce({row}.brand, '')",
+             f"(SELECT group_concat(key || ' ' || value, ' ') FROM json_each({row}.specs)"
+             f" WHERE json_valid({row}.specs))"]
+    return ', '.join(f"replace(replace({e}, 'đ', 'd'), 'Đ', 'D')" for e in exprs)
+
+
+# Chi muc full-text cho ten / hang / thong so, dong bo bang trigger tren products
+FTS_SCHEMA = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, brand, specs,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, brand, specs) VALUES (NEW.id, {_fts_columns('NEW')});
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = OLD.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, brand, specs ON products
+    WHEN OLD.name IS NOT NEW.name OR OLD.brand IS NOT NEW.brand OR OLD.specs IS NOT NEW.specs BEGIN
+        DELETE FROM products_fts WHERE rowid = OLD.id;
+        INSERT INTO products_fts (rowid, name, brand, specs) VALUES (NEW.id, {_fts_columns('NEW')});
+    END;
+'''
+
+
+def get_db():
+    """Ket noi database - moi thread giu mot connection, mo mot lan roi dung lai"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DATABASE, timeout=BUSY_TIMEOUT / 1000, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        # WAL: reader khong bi writer chan; NORMAL du an toan voi WAL va bot fsync
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-16000')
+        # Xoa / thay san pham thi xoa luon dong specs (ON DELETE CASCADE)
+        conn.execute('PRAGMA foreign_keys=ON')
+        # Neu co INSERT OR REPLACE thi trigger DELETE van chay (products_fts dong bo)
+        conn.execute('PRAGMA recursive_triggers=ON')
+        _local.conn = conn
+    return conn
+
+
+def close_db():
+    """Dong connection cua thread hien tai (neu co)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+def init_db():
+    """Khoi tao database"""
+    conn = get_db()
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sku TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            brand TEXT,
+            price INTEGER,
+            original_price INTEGER,
+            discount TEXT,
+            image TEXT,
+            url TEXT UNIQUE NOT NULL,
+            in_stock INTEGER DEFAULT 1,
+            specs TEXT,
+            content_hash TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_products_created ON products(created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_products_brand ON products(brand, price);
+
+        -- Tap hop key thong so (cot cua file export), cap nhat khi luu san pham
+        CREATE TABLE IF NOT EXISTS spec_keys (
+            spec_key TEXT PRIMARY KEY,
+            first_seen DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- Thong so tach dong (giong cellphones-crawler/schema.sql) de loc bang index.
+        -- key_norm / value_norm: khong dau, chu thuong; value_num: so da quy doi
+        -- (RAM / bo nho theo GB, man hinh theo inch, ...)
+        CREATE TABLE IF NOT EXISTS specs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            spec_key TEXT NOT NULL,
+            spec_value TEXT,
+            key_norm TEXT NOT NULL,
+            value_norm TEXT,
+            value_num REAL,
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_specs_product_id ON specs(product_id);
+        CREATE INDEX IF NOT EXISTS idx_specs_key_value ON specs(key_norm, value_norm, product_id);
+        CREATE INDEX IF NOT EXISTS idx_specs_key_num ON specs(key_norm, value_num, product_id);
+
+        -- Lich su gia: chi them dong khi gia / gia goc / con hang thay doi
+        CREATE TABLE IF NOT EXISTS price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            price INTEGER,
+            original_price INTEGER,
+            in_stock INTEGER,
+            recorded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_price_history_product ON price_history(product_id, id);
+
+        CREATE TABLE IF NOT EXISTS crawl_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            status TEXT NOT NULL,
+            message TEXT,
+            error_class TEXT,
+            attempts INTEGER DEFAULT 1,
+            duration_ms INTEGER,
+            timings TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+    conn.commit()
+
+    # DB cu: them cot van tay / validator HTTP va loai loi crawl
+    _add_columns(conn, 'products', {'content_hash': 'TEXT', 'etag': 'TEXT', 'last_modified': 'TEXT'})
+    _add_columns(conn, 'crawl_history', {'error_class': 'TEXT', 'attempts': 'INTEGER DEFAULT 1',
+                                         'duration_ms': 'INTEGER', 'timings': 'TEXT'})
+    conn.commit()
+
+    # DB cu chua co spec_keys: quet mot lan de dien
+    if conn.execute('SELECT 1 FROM spec_keys LIMIT 1').fetchone() is None:
+        for row in conn.execute("SELECT specs FROM products WHERE specs IS NOT NULL AND specs != '{}'").fetchall():
+            _add_spec_keys(conn, json.loads(row['specs']))
+        conn.commit()
+
+    # DB cu chua co bang specs: tach tu cot JSON mot lan
+    if conn.execute('SELECT 1 FROM specs LIMIT 1').fetchone() is None:
+        for row in conn.execute("SELECT id, specs FROM products WHERE specs IS NOT NULL AND specs != '{}'").fetchall():
+            _insert_specs(conn, row['id'], json.loads(row['specs']))
+        conn.commit()
+
+    # DB cu chua co lich su gia: lay gia hien tai lam moc dau tien
+    if conn.execute('SELECT 1 FROM price_history LIMIT 1').fetchone() is None:
+        conn.execute('''
+            INSERT INTO price_history (product_id, price, original_price, in_stock, recorded_at)
+            SELECT id, price, original_price, in_stock, updated_at FROM products
+        ''')
+        conn.commit()
+
+    # Chi muc full-text: lan dau tao thi index lai cac san pham da co
+    fts_exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchone()
+    conn.executescript(FTS_SCHEMA)
+    if not fts_exists:
+        conn.execute(f'INSERT INTO products_fts (rowid, name, brand, specs) '
+                     f'SELECT id, {_fts_columns("products")} FROM products')
+        conn.commit()
+
+
+def _add_columns(conn, table, columns):
+    existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for column, decl in columns.items():
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {decl}')
+
+
+def get_spec_keys():
+    """Danh sach key thong so theo thu tu xuat hien (doc tu bang spec_keys)"""
+    rows = get_db().execute('SELECT spec_key FROM spec_keys ORDER BY rowid').fetchall()
+    return [row['spec_key'] for row in rows]
+
+
+def _add_spec_keys(conn, specs):
+    conn.executemany('INSERT OR IGNORE INTO spec_keys (spec_key) VALUES (?)', [(key,) for key in specs])
+
+
+def _insert_specs(conn, product_id, specs):
+    _insert_spec_rows(conn, _spec_rows(product_id, specs))
+
+
+def _spec_rows(product_id, specs):
+    rows = []
+    for key, value in specs.items():
+        key_norm, value_num = normalize_spec(key, value)
+        rows.append((product_id, key, value, key_norm, normalize_spec_value(value), value_num))
+    return rows
+
+
+def _insert_spec_rows(conn, rows):
+    conn.executemany('''
+        INSERT INTO specs (product_id, spec_key, spec_value, key_norm, value_norm, value_num)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+
+@lru_cache(maxsize=65536)
+def normalize_spec_value(value):
+    """Gia tri de so sanh bang: khong dau, chu thuong, gom khoang trang ('16 GB' -> '16gb')"""
+    value = ' '.join(strip_accents(value).lower().split())
+    return re.sub(r'(\d) (?=[a-z])', r'\1', value)
+
+
+# Cot cap nhat khi san pham da ton tai (giu id va created_at)
+_UPSERT_SET = '''
+    sku = excluded.sku, name = excluded.name, brand = excluded.brand, price = excluded.price,
+    original_price = excluded.original_price, discount = excluded.discount, image = excluded.image,
+    url = excluded.url, in_stock = excluded.in_stock, specs = excluded.specs, content_hash = excluded.content_hash,
+    etag = excluded.etag, last_modified = excluded.last_modified, updated_at = excluded.updated_at
+'''
+
+
+_UPSERT_SQL = f'''
+    INSERT INTO products
+    (sku, name, brand, price, original_price, discount, image, url, in_stock, specs,
+     content_hash, etag, last_modified, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(sku) DO UPDATE SET {_UPSERT_SET}
+    ON CONFLICT(url) DO UPDATE SET {_UPSERT_SET}
+'''
+
+# So tham so toi da moi cau IN (...) (gioi han bien cua SQLite cu la 999)
+_IN_CHUNK = 500
+
+
+def save_product(product, updated_at=None):
+    """Luu san pham vao database (UPSERT theo sku / url)
+
+    Chi ghi price_history khi gia / gia goc / con hang thay doi va chi tach
+    lai bang specs khi thong so thay doi, nen crawl lai hang ngay rat nhe.
+    `updated_at` mac dinh la bay gio (parse lai snapshot thi dung gio tai trang).
+    """
+    try:
+        save_products([product], updated_at)
+        return True
+    except Exception as e:
+        print(f"Error saving product: {e}")
+        return False
+
+
+def save_products(products, updated_at=None):
+    """Luu nhieu san pham trong mot transaction (executemany), cung quy tac voi save_product
+
+    `updated_at` cua tung san pham lay tu product['updated_at'] neu co. Trong
+    mot lo, san pham trung URL / sku chi giu ban sau cung. Loi thi rollback
+    ca lo va raise. Tra ve so san pham da ghi.
+    """
+    latest = {}
+    for product in products:
+        latest.pop(product['url'], None)
+        latest[product['url']] = product
+    products = list({p['sku']: p for p in latest.values()}.values())
+    if not products:
+        return 0
+
+    now = updated_at or datetime.now()
+    rows = [(
+        p['sku'], p['name'], p['brand'], p['price'], p['original_price'], p['discount'], p['image'], p['url'],
+        int(bool(p['in_stock'])), json.dumps(p['specs'], ensure_ascii=False),
+        p.get('content_hash'), p.get('etag'), p.get('last_modified'), p.get('updated_at') or now,
+    ) for p in products]
+
+    conn = get_db()
+    try:
+        old_by_sku, old_by_url = {}, {}
+        for row in _select_in(conn, 'SELECT id, sku, url, price, original_price, in_stock, specs FROM products '
+                                    'WHERE sku IN ({0}) OR url IN ({0})', [p['sku'] for p in products],
+                              [p['url'] for p in products]):
+            old_by_sku[row['sku']] = row
+            old_by_url[row['url']] = row
+
+        conn.executemany(_UPSERT_SQL, rows)
+        ids = {row['url']: row['id'] for row in _select_in(
+            conn, 'SELECT id, url FROM products WHERE url IN ({0})', [p['url'] for p in products])}
+
+        history, spec_rows, spec_changed, spec_keys = [], [], [], {}
+        for p, row in zip(products, rows):
+            product_id = ids[p['url']]
+            old = old_by_sku.get(p['sku']) or old_by_url.get(p['url'])
+            price = (row[3], row[4], row[8])
+            if old is None or (old['price'], old['original_price'], old['in_stock']) != price:
+                history.append((product_id,) + price)
+            if old is None or old['specs'] != row[9]:
+                spec_changed.append((product_id,))
+                spec_rows.extend(_spec_rows(product_id, p['specs']))
+                spec_keys.update(dict.fromkeys(p['specs']))
+
+        conn.executemany('INSERT INTO price_history (product_id, price, original_price, in_stock) VALUES (?, ?, ?, ?)',
+                         history)
+        conn.executemany('DELETE FROM specs WHERE product_id = ?', spec_changed)
+        _insert_spec_rows(conn, spec_rows)
+        _add_spec_keys(conn, spec_keys)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(products)
+
+
+def _select_in(conn, sql, *value_lists):
+    """Chay SELECT co IN ({0}) theo tung doan _IN_CHUNK gia tri (moi list mot lan {0})"""
+    result = []
+    for i in range(0, len(value_lists[0]), _IN_CHUNK):
+        chunks = [values[i:i + _IN_CHUNK] for values in value_lists]
+        marks = ', '.join('?' * len(chunks[0]))
+        result.extend(conn.execute(sql.format(marks), [v for chunk in chunks for v in chunk]).fetchall())
+    return result
+
+
+def get_fingerprint(url):
+    """Van tay da luu cua URL (content_hash, etag, last_modified, has_specs); None neu chua crawl"""
+    return get_db().execute('''
+        SELECT content_hash, etag, last_modified, specs IS NOT NULL AND specs != '{}' AS has_specs
+        FROM products WHERE url = ?
+    ''', (url,)).fetchone()
+
+
+def get_product_by_url(url):
+    """San pham da luu theo URL (specs da decode); None neu khong co"""
+    row = get_db().execute('SELECT * FROM products WHERE url = ?', (url,)).fetchone()
+    if row is None:
+        return None
+    product = dict(row)
+    product['specs'] = json.loads(product['specs']) if product['specs'] else {}
+    return product
+
+
+def touch_product(url, validators=None):
+    """Danh dau da kiem tra lai ma noi dung khong doi (chi cap nhat updated_at / validator)"""
+    touch_products([(url, validators, datetime.now())])
+
+
+def touch_products(items):
+    """touch_product cho nhieu URL trong mot transaction: items = [(url, validators, updated_at)]"""
+    conn = get_db()
+    try:
+        conn.executemany('''
+            UPDATE products SET updated_at = ?, etag = coalesce(?, etag), last_modified = coalesce(?, last_modified)
+            WHERE url = ?
+        ''', [(updated_at, (v or {}).get('etag'), (v or {}).get('last_modified'), url) for url, v, updated_at in items])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def get_price_history(sku, limit=None):
+    """Lich su gia cua san pham (cu -> moi); None neu khong co san pham"""
+    conn = get_db()
+    row = conn.execute('SELECT id FROM products WHERE sku = ?', (sku,)).fetchone()
+    if row is None:
+        return None
+    # Bang chi append nen thu tu id la thu tu thoi gian
+    rows = conn.execute('''
+        SELECT price, original_price, in_stock, recorded_at FROM price_history
+        WHERE product_id = ? ORDER BY id DESC LIMIT ?
+    ''', (row['id'], limit or -1)).fetchall()
+    return [dict(r) for r in reversed(rows)]
+
+
+def log_crawl(url, status, message='', error_class=None, attempts=1, duration_ms=None, timings=None):
+    """Ghi log crawl (error_class: timeout / blocked / not_found / parse_miss / ...;
+    timings: {buoc: ms})"""
+    log_crawls([(url, status, message, error_class, attempts, duration_ms, timings)])
+
+
+def log_crawls(entries):
+    """Ghi nhieu dong crawl_history trong mot transaction (tuple cung thu tu tham so log_crawl)"""
+    conn = get_db()
+    try:
+        conn.executemany('''
+            INSERT INTO crawl_history (url, status, message, error_class, attempts, duration_ms, timings)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [entry[:6] + (json.dumps(entry[6]) if entry[6] else None,) for entry in entries])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
@@ -0,0 +1,96 @@
+"""
+HTTP fast path - lay san pham CellphoneS bang requests, khong mo Chromium
+
+Mot request HTML re hon headless browser rat nhieu ve CPU/RAM, nen day la
+buoc dau tien; chi khi du lieu thieu moi fallback sang Playwright.
+"""
+
+import os
+import threading
+import time
+
+import requests
+
+from product_parser import parse_product_html
+from rate_limit import limiter
+from snapshots import HTML, save_snapshot
+
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+# auto = HTTP truoc, thieu du lieu thi mo browser; http / browser = chi dung mot cach
+CRAWL_MODE = os.environ.get('CRAWL_MODE', 'auto')
+HTTP_TIMEOUT = int(os.environ.get('HTTP_TIMEOUT', '20'))
+
+_local = threading.local()
+
+
+def get_session():
+    """requests.Session rieng moi thread (giu keep-alive)"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        _local.session = session
+    return session
+
+
+def rate_limited_get(session, url, **kwargs):
+    """session.get qua rate limiter theo host, bao lai status / thoi gian cho limiter"""
+    limiter.wait(url)
+    start = time.monotonic()
+    try:
+        response = session.get(url, **kwargs)
+    except requests.RequestException:
+        limiter.report(url, None, time.monotonic() - start)
+        raise
+    limiter.report(url, response.status_code, time.monotonic() - start, response.headers.get('Retry-After'))
+    return response
+
+
+def fetch_html(url, timeout=HTTP_TIMEOUT):
+    """GET trang, raise neu status khong phai 2xx"""
+    return _decode(rate_limited_get(get_session(), url, timeout=timeout))
+
+
+def _decode(response):
+    response.raise_for_status()
+    # Khong co charset trong header thi requests doan latin-1, trang VN la utf-8
+    if 'charset' not in response.headers.get('Content-Type', ''):
+        response.encoding = 'utf-8'
+    return response.text
+
+
+def fetch_product_http(url):
+    """Crawl san pham chi bang HTTP + parse HTML"""
+    html = fetch_html(url)
+    save_snapshot(url, HTML, html)
+    return parse_product_html(html, url)
+
+
+def fetch_product_conditional(url, etag=None, last_modified=None):
+    """GET co dieu kien (If-None-Match / If-Modified-Since) roi parse
+
+    Tra ve (product, validators); product la None khi server tra 304 (trang
+    khong doi). validators = {'etag', 'last_modified'} de luu cho lan sau.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    response = rate_limited_get(get_session(), url, headers=headers, timeout=HTTP_TIMEOUT)
+    validators = {
+        'etag': response.headers.get('ETag') or etag,
+        'last_modified': response.headers.get('Last-Modified') or last_modified,
+    }
+    if response.status_code == 304:
+        return None, validators
+    html = _decode(response)
+    save_snapshot(url, HTML, html)
+    return parse_product_html(html, url), validators
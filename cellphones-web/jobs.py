@@ -0,0 +1,216 @@
+"""
+Batch crawl jobs chay nen trong Flask process
+
+Job chay tren thread rieng nen van tiep tuc khi tab trinh duyet bi dong;
+client theo doi tien do qua stream GET /api/jobs/<id>/events (cho bang
+wait()) hoac poll GET /api/jobs/<id>. Neu co CrawlState,
+hang doi URL duoc luu xuong SQLite de chay tiep sau khi process restart;
+handler ghi qua WriteBuffer thi URL chi duoc danh dau sau khi buffer commit
+(gan write_buffer.on_flush = manager.committed).
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# So job da xong giu lai trong bo nho de client con poll duoc
+MAX_FINISHED_JOBS = 50
+
+
+class CrawlJob:
+    """Trang thai cua mot batch crawl"""
+
+    def __init__(self, urls, concurrency, job_id=None, skipped=0):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.urls = urls
+        self.concurrency = concurrency
+        self.status = 'pending'
+        self.results = []
+        self.success = 0
+        self.failed = 0
+        # So URL da xong tu lan chay truoc (khi resume)
+        self.skipped = skipped
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        # Bao cho cac stream dang cho khi co ket qua moi / job xong
+        self._changed = threading.Condition(self._lock)
+
+    def add_result(self, entry):
+        """Ghi ket qua cua mot URL"""
+        with self._lock:
+            self.results.append(entry)
+            if entry.get('success'):
+                self.success += 1
+            else:
+                self.failed += 1
+            self._changed.notify_all()
+
+    def finish(self):
+        """Danh dau job xong va danh thuc cac stream dang cho"""
+        with self._lock:
+            self.finished_at = time.time()
+            self.status = 'done'
+            self._changed.notify_all()
+
+    def wait(self, since, timeout=None):
+        """Cho den khi co ket qua sau vi tri `since` hoac job xong; tra ve True neu co thay doi"""
+        with self._lock:
+            return self._changed.wait_for(lambda: len(self.results) > since or self.status == 'done', timeout)
+
+    def to_dict(self, since=0):
+        """Tra ve tien do; chi kem cac ket qua tu vi tri `since`"""
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'total': len(self.urls),
+                'done': len(self.results),
+                'success': self.success,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'concurrency': self.concurrency,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+                'results': self.results[since:],
+            }
+
+
+class JobManager:
+    """Tao va theo doi cac batch job"""
+
+    def __init__(self, handler, default_concurrency=1, max_concurrency=4, state=None, buffer=None):
+        self.handler = handler
+        self.default_concurrency = default_concurrency
+        self.max_concurrency = max_concurrency
+        self.state = state
+        # WriteBuffer ma handler ghi vao (neu co): checkpoint doi buffer commit
+        self.buffer = buffer
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # URL da crawl nhung chua commit: url -> [job_id, ...] theo thu tu
+        self._uncommitted = {}
+
+    def submit(self, urls, concurrency=None):
+        """Tao job moi va chay nen, tra ve job"""
+        concurrency = concurrency or self.default_concurrency
+        concurrency = max(1, min(int(concurrency), self.max_concurrency))
+
+        job = CrawlJob(urls, concurrency)
+        if self.state:
+            self.state.start_job(job.id, urls, concurrency)
+        self._start(job)
+        return job
+
+    def resume(self):
+        """Chay tiep cac job chua xong tu lan chay truoc (bo qua URL da done)"""
+        if not self.state:
+            return []
+        jobs = []
+        for row in self.state.unfinished_jobs():
+            urls = self.state.remaining(row['id'])
+            skipped = self.state.counts(row['id'])['done']
+            concurrency = max(1, min(row['concurrency'] or self.default_concurrency, self.max_concurrency))
+            job = CrawlJob(urls, concurrency, job_id=row['id'], skipped=skipped)
+            self._start(job)
+            jobs.append(job)
+        return jobs
+
+    def _start(self, job):
+        """Dang ky job va chay tren thread nen"""
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+
+        thread = threading.Thread(target=self._run, args=(job,), name=f'crawl-job-{job.id}', daemon=True)
+        thread.start()
+
+    def get(self, job_id):
+        """Lay job theo id (None neu khong co)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        """Crawl tat ca URL cua job voi so luong song song gioi han"""
+        job.status = 'running'
+        deferred = self.state is not None and self.buffer is not None
+        with ThreadPoolExecutor(max_workers=job.concurrency) as executor:
+            futures = {executor.submit(self._timed, job, url, deferred): url for url in job.urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    result, seconds = {'success': False, 'error': str(e)}, None
+                    # Handler loi giua chung: co the khong co log nao de cho commit
+                    if deferred:
+                        self._forget(job.id, url)
+                        self.state.mark(job.id, url, False, str(e))
+                entry = _summarize(url, result)
+                entry['duration_ms'] = round(seconds * 1000) if seconds is not None else None
+                job.add_result(entry)
+                if self.state and not deferred:
+                    self.state.mark(job.id, url, result.get('success'), result.get('error', ''))
+        if self.buffer:
+            # Job xong = du lieu da commit; on_flush danh dau cac URL cuoi
+            self.buffer.flush()
+        if self.state and not self._waiting(job.id):
+            self.state.finish_job(job.id)
+        job.finish()
+
+    def _timed(self, job, url, deferred=False):
+        """Goi handler, tra ve (ket qua, so giay)"""
+        if deferred:
+            # Dang ky truoc khi goi: buffer co the flush log ngay khi handler ghi
+            with self._lock:
+                self._uncommitted.setdefault(url, []).append(job.id)
+        start = time.perf_counter()
+        result = self.handler(url)
+        return result, time.perf_counter() - start
+
+    def committed(self, logs):
+        """Hook WriteBuffer.on_flush: danh dau URL cua job khi log crawl da commit"""
+        marks = {}
+        with self._lock:
+            for url, status, message, *_ in logs:
+                job_ids = self._uncommitted.get(url)
+                # Crawl ngoai job (vd /api/crawl) khong co checkpoint
+                if not job_ids:
+                    continue
+                job_id = job_ids.pop(0)
+                if not job_ids:
+                    del self._uncommitted[url]
+                marks.setdefault(job_id, []).append((url, status != 'error', message))
+        for job_id, results in marks.items():
+            self.state.mark_many(job_id, results)
+
+    def _forget(self, job_id, url):
+        """Bo dang ky cho commit cua mot URL"""
+        with self._lock:
+            job_ids = self._uncommitted.get(url, [])
+            if job_id in job_ids:
+                job_ids.remove(job_id)
+            if not job_ids:
+                self._uncommitted.pop(url, None)
+
+    def _waiting(self, job_id):
+        """Job con URL chua commit (buffer loi tam thoi): chua duoc finish_job"""
+        with self._lock:
+            return any(job_id in job_ids for job_ids in self._uncommitted.values())
+
+    def _prune(self):
+        """Bo bot job da xong cu nhat khi vuot gioi han"""
+        finished = [j for j in self._jobs.values() if j.status == 'done']
+        finished.sort(key=lambda j: j.finished_at)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+
+def _summarize(url, result):
+    """Rut gon ket qua crawl (khong giu specs trong bo nho job)"""
+    if result.get('success'):
+        product = result['product']
+        return {'url': url, 'success': True, 'sku': product.get('sku'), 'name': product.get('name')}
+    return {'url': url, 'success': False, 'error': result.get('error', ''), 'error_class': result.get('error_class')}
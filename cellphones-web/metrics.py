@@ -0,0 +1,137 @@
+"""
+Do thoi gian tung buoc crawl va xuat dang Prometheus (GET /metrics)
+
+Khong can prometheus_client: chi can counter / histogram don gian, an toan
+thread, render ra text exposition format 0.0.4.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Bucket (giay) cho thoi gian crawl: tu vai chuc ms (HTTP) den ca phut (browser cham)
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    """Bo dem chi tang"""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _format_labels(self.labels, key), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Phan bo gia tri theo bucket (+ sum, count)"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [so mau theo tung bucket, tong, so mau]
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        result = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                for bound, n in zip(self.buckets, counts):
+                    result.append((f'{self.name}_bucket', _format_labels(self.labels, key, [('le', bound)]), n))
+                result.append((f'{self.name}_bucket', _format_labels(self.labels, key, [('le', '+Inf')]), count))
+                result.append((f'{self.name}_sum', _format_labels(self.labels, key), round(total, 6)))
+                result.append((f'{self.name}_count', _format_labels(self.labels, key), count))
+        return result
+
+
+class GaugeFunc:
+    """Gauge doc gia tri tai thoi diem render: fn() -> {tuple label: gia tri}"""
+
+    type = 'gauge'
+
+    def __init__(self, name, help, labels, fn):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.fn = fn
+        _registry.append(self)
+
+    def samples(self):
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in self.fn().items()]
+
+
+def render():
+    """Toan bo metric dang text cho Prometheus"""
+    lines = []
+    for metric in _registry:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{labels} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+CRAWLS = Counter('crawl_requests_total', 'So lan crawl san pham theo ket qua', ['status'])
+CRAWL_ERRORS = Counter('crawl_errors_total', 'So lan crawl loi theo loai loi', ['error_class'])
+CRAWL_RETRIES = Counter('crawl_retries_total', 'So lan thu lai do loi tam thoi')
+CRAWL_SECONDS = Histogram('crawl_duration_seconds', 'Tong thoi gian crawl + luu mot URL', ['status'])
+STAGE_SECONDS = Histogram('crawl_stage_seconds', 'Thoi gian tung buoc crawl', ['stage'])
+
+
+def record(timings, stage, seconds):
+    """Ghi thoi gian mot buoc vao histogram va vao dict timings (ms, cong don qua cac lan thu)"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0) + seconds * 1000, 1)
+
+
+@contextmanager
+def timed(timings, stage):
+    """Do mot khoi lenh (dung duoc ca quanh await)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(timings, stage, time.perf_counter() - start)
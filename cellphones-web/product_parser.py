@@ -0,0 +1,268 @@
+"""
+Parse san pham CellphoneS tu HTML (khong can browser)
+
+Chua selectors va cac ham tien ich dung chung giua HTTP fast path va
+Playwright engine.
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+from functools import lru_cache
+
+from bs4 import BeautifulSoup
+
+
+PRICE_SELECTORS = [
+    '.tpt---sale-price .sale-price span',
+    '.sale-price span',
+    '.product__price--show',
+    '.box-info__box-price .product__price--show',
+    '.product-price .sale-price',
+]
+
+ORIGINAL_PRICE_SELECTORS = [
+    '.tpt---sale-price .base-price',
+    '.base-price',
+    '.product__price--through',
+    '.product-price del',
+]
+
+IMG_SELECTORS = [
+    '.box-gallery__detail img',
+    '.box-gallery__image img',
+    '.gallery-product img',
+    '.swiper-slide img[src*="cellphones"]',
+    '.product-image img',
+    'img[src*="media/catalog"]',
+]
+
+MODAL_SELECTOR = '.modal.is-active, [class*="modal"][class*="active"], .modal-technical'
+SPEC_TABLE_SELECTOR = '.technical-content tr, .technical-content-item'
+
+
+def parse_product_html(html, url):
+    """Lay thong tin san pham tu HTML server render (+ JSON-LD neu co)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    ld = _find_product_ld(soup)
+    product = {}
+
+    # Ten: uu tien h1, JSON-LD du phong
+    name_el = soup.select_one('h1')
+    product['name'] = name_el.get_text(strip=True) if name_el else ld.get('name', '')
+
+    # Gia - thu selectors nhu ban browser, JSON-LD du phong
+    price = _first_price(soup, PRICE_SELECTORS)
+    if not price:
+        price = _ld_price(ld)
+    product['price'] = price
+
+    original_price = _first_price(soup, ORIGINAL_PRICE_SELECTORS)
+    product['original_price'] = original_price if original_price > 0 else price
+    product['discount'] = calc_discount(product['price'], product['original_price'])
+
+    # Hinh anh
+    image = ''
+    for sel in IMG_SELECTORS:
+        img_el = soup.select_one(sel)
+        if img_el:
+            src = img_el.get('src') or img_el.get('data-src')
+            # Bo qua youtube thumbnail
+            if src and 'youtube' not in src and 'data:image' not in src:
+                image = src
+                break
+    if not image:
+        image = _ld_image(ld)
+    product['image'] = image
+
+    product['sku'] = extract_sku_from_url(url)
+    product['url'] = url
+    product['brand'] = extract_brand(product['name'])
+    product['in_stock'] = _ld_in_stock(ld)
+
+    # Thong so: bang trong modal (neu da render san) roi den bang tren trang
+    specs = {}
+    modal = soup.select_one(MODAL_SELECTOR)
+    if modal:
+        specs = parse_spec_rows(modal.select('tr'))
+    if not specs:
+        specs = parse_spec_rows(soup.select(SPEC_TABLE_SELECTOR))
+    product['specs'] = specs
+
+    return product
+
+
+def parse_spec_rows(rows):
+    """Doc cap key/value tu cac dong <tr> da parse"""
+    specs = {}
+    for row in rows:
+        cols = row.find_all('td')
+        if len(cols) >= 2:
+            key = cols[0].get_text('\n', strip=True)
+            value = cols[1].get_text('\n', strip=True)
+            if key and value:
+                specs[key] = value
+    return specs
+
+
+# Key chuan hoa cho cac thong so hay loc; key khac duoc slug hoa
+SPEC_KEY_ALIASES = [
+    ('ram', ['dung luong ram', 'ram']),
+    ('storage', ['o cung', 'bo nho trong', 'dung luong luu tru', 'ssd', 'rom']),
+    ('screen_size', ['kich thuoc man hinh']),
+    ('battery', ['dung luong pin', 'pin']),
+    ('weight', ['trong luong', 'khoi luong']),
+    ('cpu', ['loai cpu', 'chipset', 'cpu', 'vi xu ly']),
+    ('gpu', ['loai card do hoa', 'card do hoa', 'gpu']),
+    ('refresh_rate', ['tan so quet']),
+]
+
+_UNIT_GB = {'mb': 1 / 1024, 'gb': 1, 'tb': 1024}
+
+
+# Key / gia tri lap lai rat nhieu giua cac san pham - cache khi ghi hang loat
+@lru_cache(maxsize=65536)
+def normalize_spec(key, value):
+    """Chuan hoa mot thong so -> (norm_key, value_num hoac None)
+
+    RAM / bo nho quy ve GB, man hinh ve inch, pin ve mAh, trong luong ve kg;
+    key khac lay so dau tien neu gia tri bat dau bang so.
+    """
+    norm_key = normalize_spec_key(key)
+    text = strip_accents(value).lower().replace(',', '.')
+
+    if norm_key in ('ram', 'storage'):
+        match = re.search(r'(\d+(?:\.\d+)?)\s*(mb|gb|tb)', text)
+        number = float(match.group(1)) * _UNIT_GB[match.group(2)] if match else None
+    elif norm_key == 'weight':
+        match = re.search(r'(\d+(?:\.\d+)?)\s*(kg|g)\b', text)
+        number = (float(match.group(1)) / (1000 if match.group(2) == 'g' else 1)) if match else None
+    else:
+        match = re.match(r'\s*(\d+(?:\.\d+)?)', text)
+        number = float(match.group(1)) if match else None
+
+    return norm_key, number
+
+
+@lru_cache(maxsize=4096)
+def normalize_spec_key(key):
+    """Key khong dau, chu thuong; gom cac ten tuong duong ve mot key"""
+    plain = re.sub(r'\s+', ' ', strip_accents(key).lower()).strip()
+    for norm_key, names in SPEC_KEY_ALIASES:
+        if plain in names:
+            return norm_key
+    return re.sub(r'[^a-z0-9]+', '_', plain).strip('_')
+
+
+def strip_accents(text):
+    """Bo dau tieng Viet: 'Màn hình' -> 'Man hinh'"""
+    text = unicodedata.normalize('NFD', text or '')
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    return text.replace('đ', 'd').replace('Đ', 'D')
+
+
+def content_hash(product):
+    """Van tay noi dung san pham (ten, gia, ton kho, thong so)
+
+    Chi dung de so sanh hai lan parse cung mot cach (HTTP), khong so sanh
+    ket qua HTTP voi ket qua browser.
+    """
+    fields = {k: product.get(k) for k in ('name', 'price', 'original_price', 'in_stock', 'specs')}
+    raw = json.dumps(fields, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def is_complete(product, min_specs=1):
+    """Du lieu HTTP du dung chua, hay phai mo browser"""
+    return bool(product.get('name')) and product.get('price', 0) > 0 \
+        and len(product.get('specs', {})) >= min_specs
+
+
+def parse_price(price_text):
+    """Chuyen doi text gia thanh so"""
+    numbers = re.sub(r'[^\d]', '', str(price_text or ''))
+    return int(numbers) if numbers else 0
+
+
+def calc_discount(price, original_price):
+    """Tinh % giam gia dang '-12%'"""
+    if original_price > price and price > 0:
+        return f"-{round((original_price - price) / original_price * 100)}%"
+    return ''
+
+
+def extract_sku_from_url(url):
+    """Lay SKU tu URL"""
+    if url:
+        return url.split('/')[-1].replace('.html', '')
+    return ''
+
+
+def extract_brand(name):
+    """Lay brand tu ten san pham"""
+    brands = ['Dell', 'HP', 'Lenovo', 'Asus', 'Acer', 'MSI', 'Apple', 'MacBook',
+              'Samsung', 'LG', 'Huawei', 'Microsoft', 'Gigabyte', 'Razer', 'iPhone',
+              'iPad', 'Xiaomi', 'OPPO', 'Vivo', 'Realme', 'Sony', 'JBL', 'Marshall']
+    name_lower = name.lower()
+    for brand in brands:
+        if brand.lower() in name_lower:
+            return brand
+    return ''
+
+
+def _first_price(soup, selectors):
+    """Gia dau tien > 0 theo danh sach selectors"""
+    for sel in selectors:
+        el = soup.select_one(sel)
+        if el:
+            price = parse_price(el.get_text())
+            if price > 0:
+                return price
+    return 0
+
+
+def _find_product_ld(soup):
+    """Tim object schema.org Product trong cac the JSON-LD"""
+    for script in soup.find_all('script', {'type': 'application/ld+json'}):
+        try:
+            data = json.loads(script.string or '')
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            data = data.get('@graph', [data])
+        candidates = data if isinstance(data, list) else []
+        for item in candidates:
+            if isinstance(item, dict) and item.get('@type') == 'Product':
+                return item
+    return {}
+
+
+def _ld_offer(ld):
+    """Offer dau tien cua JSON-LD Product"""
+    offers = ld.get('offers') or {}
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    return offers
+
+
+def _ld_price(ld):
+    """Gia trong JSON-LD la so (co the '12990000.00'), khong phai text VND"""
+    offer = _ld_offer(ld)
+    try:
+        return int(float(offer.get('price') or offer.get('lowPrice') or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _ld_image(ld):
+    image = ld.get('image') or ''
+    if isinstance(image, list):
+        image = image[0] if image else ''
+    return image if isinstance(image, str) else ''
+
+
+def _ld_in_stock(ld):
+    """Con hang theo JSON-LD; khong co thong tin thi coi nhu con hang"""
+    availability = _ld_offer(ld).get('availability', '')
+    return 'OutOfStock' not in availability
@@ -0,0 +1,125 @@
+"""
+Gioi han toc do request theo host (token bucket) dung chung cho moi crawler
+
+Moi host co mot bucket rieng, toc do tu dieu chinh (AIMD):
+- response nhanh, thanh cong: tang dan toc do (+RATE_LIMIT_STEP) den RATE_LIMIT_MAX_RPS
+- 429 / 503: giam mot nua va tam dung host theo Retry-After
+- response cham hoac timeout: giam 20%
+
+Dung ca tu thread (requests) lan tu asyncio (Playwright) - trang thai
+chung nen tong toc do toi mot site khong phu thuoc so duong crawl.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+
+RATE_LIMIT_RPS = float(os.environ.get('RATE_LIMIT_RPS', '4'))
+RATE_LIMIT_MAX_RPS = float(os.environ.get('RATE_LIMIT_MAX_RPS', str(RATE_LIMIT_RPS * 2)))
+RATE_LIMIT_MIN_RPS = float(os.environ.get('RATE_LIMIT_MIN_RPS', '0.2'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', '4'))
+RATE_LIMIT_STEP = float(os.environ.get('RATE_LIMIT_STEP', '0.1'))
+# Response lau hon nguong nay (giay) coi nhu server dang qua tai
+SLOW_RESPONSE = float(os.environ.get('SLOW_RESPONSE_SECONDS', '5'))
+
+# Status bao hieu bi chan / qua tai
+THROTTLE_STATUSES = (429, 503)
+MAX_RETRY_AFTER = 300
+
+
+class HostBucket:
+    """Token bucket cua mot host"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self, now):
+        """Lay mot token, tra ve so giay phai doi truoc khi gui request"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+
+class RateLimiter:
+    """Bucket theo host + dieu chinh toc do theo phan hoi cua server"""
+
+    def __init__(self, rate=RATE_LIMIT_RPS, max_rate=RATE_LIMIT_MAX_RPS, min_rate=RATE_LIMIT_MIN_RPS,
+                 burst=RATE_LIMIT_BURST, step=RATE_LIMIT_STEP, slow=SLOW_RESPONSE):
+        self.rate = rate
+        self.max_rate = max(max_rate, rate)
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self.step = step
+        self.slow = slow
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url):
+        host = urlparse(url).hostname or url
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = HostBucket(self.rate, self.burst)
+        return bucket
+
+    def _reserve(self, url):
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            return self._bucket(url).reserve(time.monotonic())
+
+    def wait(self, url):
+        """Chan thread den khi duoc phep request toi host cua url"""
+        delay = self._reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, url):
+        """Nhu wait() nhung nhuong event loop"""
+        delay = self._reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def report(self, url, status, elapsed, retry_after=None):
+        """Ghi nhan ket qua request; status None = loi ket noi / timeout"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            bucket = self._bucket(url)
+            if status in THROTTLE_STATUSES:
+                bucket.rate = max(self.min_rate, bucket.rate / 2)
+                pause = _parse_retry_after(retry_after) or 1 / bucket.rate
+                bucket.paused_until = max(bucket.paused_until, time.monotonic() + pause)
+                # Bo token con du de khong ban ngay mot loat request sau khi het pause
+                bucket.tokens = min(bucket.tokens, 0)
+            elif status is None or elapsed >= self.slow:
+                bucket.rate = max(self.min_rate, bucket.rate * 0.8)
+            elif status < 400:
+                bucket.rate = min(self.max_rate, bucket.rate + self.step)
+
+    def snapshot(self):
+        """Toc do hien tai theo host: {host: {'rate', 'paused'}}"""
+        now = time.monotonic()
+        with self._lock:
+            return {host: {'rate': round(b.rate, 3), 'paused': max(0.0, round(b.paused_until - now, 1))}
+                    for host, b in self._buckets.items()}
+
+
+def _parse_retry_after(value):
+    """Retry-After dang so giay (bo qua dang ngay thang)"""
+    try:
+        return min(float(value), MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return None
+
+
+# Dung chung trong process (web app, CLI)
+limiter = RateLimiter()
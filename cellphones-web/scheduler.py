@@ -0,0 +1,160 @@
+"""
+Tu dong crawl lai san pham da luu, uu tien san pham "cu" va hay doi gia
+
+Moi chu ky chon cac san pham co diem uu tien cao nhat:
+
+    so gio tu lan crawl cuoi * (1 + so lan doi gia 30 ngay) * he so ton kho
+
+va giao cho JobManager nhu mot batch job thuong, trong gioi han so trang
+moi gio. Chay trong web app (REFRESH_PAGES_PER_HOUR > 0) hoac rieng:
+
+    python scheduler.py --pages-per-hour 300
+"""
+
+import argparse
+import os
+import threading
+import time
+
+from database import get_db
+
+
+# 0 = tat scheduler trong web app
+REFRESH_PAGES_PER_HOUR = int(os.environ.get('REFRESH_PAGES_PER_HOUR', '0'))
+REFRESH_INTERVAL = int(os.environ.get('REFRESH_INTERVAL', '300'))
+# Khong crawl lai san pham vua cap nhat gan day
+REFRESH_MIN_AGE_HOURS = float(os.environ.get('REFRESH_MIN_AGE_HOURS', '6'))
+
+VOLATILITY_DAYS = 30
+# Het hang thi it doi gia hon, nhung van xem lai de bat khi co hang lai
+OUT_OF_STOCK_WEIGHT = 0.5
+
+
+def pick_stale_products(limit, min_age_hours=REFRESH_MIN_AGE_HOURS):
+    """Cac san pham can crawl lai, diem uu tien cao truoc
+
+    Tra ve list dict {url, sku, age_hours, changes, in_stock, score}.
+    """
+    # updated_at ghi bang datetime.now() (gio may) nen so voi 'now', 'localtime'
+    rows = get_db().execute(f'''
+        SELECT url, sku, in_stock, age_hours, changes,
+               age_hours * (1 + changes) * (CASE WHEN in_stock THEN 1.0 ELSE {OUT_OF_STOCK_WEIGHT} END) AS score
+        FROM (
+            SELECT p.url, p.sku, p.in_stock,
+                   (julianday('now', 'localtime') - julianday(p.updated_at)) * 24 AS age_hours,
+                   (SELECT COUNT(*) FROM price_history h
+                    WHERE h.product_id = p.id AND h.recorded_at >= datetime('now', ?)
+                      -- dong dau tien la luc them san pham, khong phai lan doi gia
+                      AND h.id > (SELECT MIN(id) FROM price_history WHERE product_id = p.id)) AS changes
+            FROM products p
+        )
+        WHERE age_hours >= ?
+        ORDER BY score DESC
+        LIMIT ?
+    ''', (f'-{VOLATILITY_DAYS} days', min_age_hours, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+class RefreshScheduler:
+    """Dinh ky chon san pham cu va submit batch job, khong vuot ngan sach trang/gio"""
+
+    def __init__(self, submit, pages_per_hour=REFRESH_PAGES_PER_HOUR, interval=REFRESH_INTERVAL,
+                 min_age_hours=REFRESH_MIN_AGE_HOURS):
+        self.submit = submit
+        self.pages_per_hour = pages_per_hour
+        self.interval = interval
+        self.min_age_hours = min_age_hours
+        self.job = None
+        self._credit = 0.0
+        self._last_tick = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Chay tren thread nen (trong web app)"""
+        if self.pages_per_hour <= 0 or self._thread:
+            return
+        self._thread = threading.Thread(target=self.run_forever, name='refresh-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self):
+        """Vong lap chinh: mot chu ky moi `interval` giay den khi stop()"""
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[refresh] Loi: {e}")
+            self._stop.wait(self.interval)
+
+    def run_once(self):
+        """Mot chu ky: cong them ngan sach, chon san pham va submit job (hoac None)"""
+        now = time.monotonic()
+        elapsed = self.interval if self._last_tick is None else now - self._last_tick
+        self._last_tick = now
+        # Toi da tich luy mot gio ngan sach khi job truoc chay lau
+        self._credit = min(self._credit + self.pages_per_hour * elapsed / 3600, self.pages_per_hour)
+
+        # Job truoc chua xong thi doi, tranh chong cheo len cung san pham
+        if self.job is not None and self.job.status != 'done':
+            return None
+
+        budget = int(self._credit)
+        if budget < 1:
+            return None
+        products = pick_stale_products(budget, self.min_age_hours)
+        if not products:
+            return None
+
+        self._credit -= len(products)
+        self.job = self.submit([p['url'] for p in products])
+        print(f"[refresh] Crawl lai {len(products)} san pham (job {self.job.id})")
+        return self.job
+
+    def status(self):
+        """Trang thai cho API"""
+        return {
+            'enabled': self.pages_per_hour > 0,
+            'pages_per_hour': self.pages_per_hour,
+            'interval': self.interval,
+            'min_age_hours': self.min_age_hours,
+            'credit': round(self._credit, 2),
+            'job_id': self.job.id if self.job else None,
+        }
+
+
+if __name__ == '__main__':
+    from functools import partial
+
+    from crawler import browser_pool, crawl_and_save
+    from database import init_db
+    from jobs import JobManager
+    from write_buffer import WriteBuffer
+
+    parser = argparse.ArgumentParser(description='Worker crawl lai san pham theo do uu tien')
+    parser.add_argument('--pages-per-hour', type=int, default=REFRESH_PAGES_PER_HOUR or 120,
+                        help='Ngan sach so trang crawl moi gio')
+    parser.add_argument('--interval', type=int, default=REFRESH_INTERVAL, help='So giay giua hai chu ky')
+    parser.add_argument('--min-age', type=float, default=REFRESH_MIN_AGE_HOURS,
+                        help='Chi crawl lai san pham cap nhat truoc it nhat N gio')
+    parser.add_argument('--once', action='store_true', help='Chay mot chu ky roi thoat')
+    args = parser.parse_args()
+
+    init_db()
+    buffer = WriteBuffer()
+    manager = JobManager(partial(crawl_and_save, buffer=buffer),
+                         default_concurrency=browser_pool.size, max_concurrency=browser_pool.size, buffer=buffer)
+    scheduler = RefreshScheduler(manager.submit, args.pages_per_hour, args.interval, args.min_age)
+
+    if args.once:
+        job = scheduler.run_once()
+        while job and job.status != 'done':
+            time.sleep(1)
+        print(job.to_dict(since=len(job.urls)) if job else "[refresh] Khong co san pham can crawl lai")
+    else:
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            pass
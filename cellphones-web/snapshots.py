@@ -0,0 +1,180 @@
+"""
+Luu HTML / modal thong so / __NEXT_DATA__ da tai ve de parse lai offline
+
+Noi dung duoc nen (zstd neu cai zstandard, khong thi gzip) va luu theo
+sha256 cua noi dung goc - trang khong doi giua cac lan crawl chi luu mot
+lan. Bang index (SQLite rieng trong SNAPSHOT_DIR) ghi URL nao, loai nao,
+hash nao, luc nao; reparse_snapshots.py dung no de dung lai bang products
+khi sua parser ma khong can crawl lai.
+
+    SNAPSHOT_DIR/ab/cdef...zst     blob
+    SNAPSHOT_DIR/index.db          (url, kind, hash, created_at)
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# 0 = khong luu snapshot
+SNAPSHOTS = os.environ.get('SNAPSHOTS', '1') != '0'
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshots')
+ZSTD_LEVEL = int(os.environ.get('SNAPSHOT_ZSTD_LEVEL', '10'))
+
+# Loai snapshot
+HTML = 'html'            # HTML trang chi tiet (server render hoac DOM browser)
+MODAL = 'modal'          # outerHTML modal thong so sau khi click 'Xem tat ca'
+NEXT_DATA = 'next_data'  # JSON __NEXT_DATA__ cua Phong Vu
+
+
+def _compress(data):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), '.zst'
+    return gzip.compress(data, compresslevel=6), '.gz'
+
+
+def _decompress(data, ext):
+    if ext == '.zst':
+        if zstandard is None:
+            raise RuntimeError('Snapshot nen zstd, can cai zstandard de doc')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class SnapshotStore:
+    """Blob nen theo hash + index SQLite theo URL"""
+
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript('''
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                -- gio may, cung cach ghi products.updated_at
+                created_at DATETIME DEFAULT (datetime('now', 'localtime'))
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_snapshots_url ON snapshots(url, kind, id);
+        ''')
+        self._conn.commit()
+
+    def _path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest[2:] + ext)
+
+    def _find(self, digest):
+        for ext in ('.zst', '.gz'):
+            path = self._path(digest, ext)
+            if os.path.exists(path):
+                return path, ext
+        return None, None
+
+    def put(self, url, kind, content):
+        """Luu noi dung (str/bytes) cua URL, tra ve hash; blob da co thi chi ghi index"""
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        digest = hashlib.sha256(data).hexdigest()
+
+        if self._find(digest)[0] is None:
+            blob, ext = _compress(data)
+            path = self._path(digest, ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Ghi file tam roi rename: process khac khong bao gio doc phai blob do dang
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp, path)
+
+        with self._lock:
+            # Chi bo qua khi lap lai dung dong cuoi cua URL (moi loai); so theo
+            # tung loai thi modal khong doi se khong duoc ghi lai sau HTML moi
+            # va latest() mat cap HTML + modal cua lan crawl nay
+            last = self._conn.execute('SELECT kind, hash FROM snapshots WHERE url = ? ORDER BY id DESC LIMIT 1',
+                                      (url,)).fetchone()
+            if last is None or (last['kind'], last['hash']) != (kind, digest):
+                self._conn.execute('INSERT INTO snapshots (url, kind, hash) VALUES (?, ?, ?)', (url, kind, digest))
+                self._conn.commit()
+        return digest
+
+    def get(self, digest):
+        """Noi dung (str) theo hash; None neu blob khong con"""
+        path, ext = self._find(digest)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return _decompress(f.read(), ext).decode('utf-8')
+
+    def latest(self, kind=HTML, url=None):
+        """Snapshot moi nhat moi URL: list dict {id, url, hash, created_at, modal_hash}
+
+        modal_hash chi co khi modal duoc chup sau HTML moi nhat (cung lan crawl
+        bang browser), tranh ghep thong so cu vao trang moi hon.
+        """
+        where, params = ('AND s.url = ?', [url]) if url else ('', [])
+        with self._lock:
+            rows = self._conn.execute(f'''
+                SELECT s.id, s.url, s.hash, s.created_at,
+                       (SELECT m.hash FROM snapshots m
+                        WHERE m.url = s.url AND m.kind = '{MODAL}' AND m.id > s.id
+                        ORDER BY m.id DESC LIMIT 1) AS modal_hash
+                FROM snapshots s
+                WHERE s.kind = ? {where}
+                  AND s.id = (SELECT MAX(id) FROM snapshots WHERE url = s.url AND kind = s.kind)
+                ORDER BY s.id
+            ''', [kind] + params).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        """So dong index, so blob va dung luong tren dia"""
+        blobs = size = 0
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(('.zst', '.gz')):
+                    blobs += 1
+                    size += os.path.getsize(os.path.join(dirpath, name))
+        with self._lock:
+            rows = self._conn.execute('SELECT kind, COUNT(*) AS n FROM snapshots GROUP BY kind').fetchall()
+        return {'entries': {row['kind']: row['n'] for row in rows}, 'blobs': blobs, 'bytes': size}
+
+    def close(self):
+        self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Store dung chung trong process (tao khi can lan dau)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SnapshotStore()
+    return _store
+
+
+def save_snapshot(url, kind, content):
+    """Luu snapshot neu dang bat; loi ghi dia khong lam hong lan crawl"""
+    if not SNAPSHOTS or not content:
+        return None
+    try:
+        return get_store().put(url, kind, content)
+    except Exception as e:
+        print(f"[snapshot] Khong luu duoc {kind} {url}: {e}")
+        return None
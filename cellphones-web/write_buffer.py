@@ -0,0 +1,178 @@
+"""
+Ghi tre (write-behind) vao SQLite theo lo
+
+Khi crawl hang loat, moi san pham / dong crawl_history la mot transaction
+va mot lan fsync rieng, nam ngay tren duong crawl cua tung URL. Buffer gom
+cac lenh ghi lai va flush bang executemany trong mot transaction moi
+WRITE_BUFFER_ROWS dong hoac WRITE_BUFFER_MS ms (thread nen); close() /
+atexit flush not phan con lai.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from crawl_errors import UNKNOWN
+from database import close_db, log_crawls, save_products, touch_products
+from metrics import record
+
+
+WRITE_BUFFER_ROWS = int(os.environ.get('WRITE_BUFFER_ROWS', '500'))
+WRITE_BUFFER_MS = int(os.environ.get('WRITE_BUFFER_MS', '200'))
+# Luong ghi khong theo kip: thread goi tu flush khi hang doi gap N lan lo
+BACKPRESSURE_FACTOR = 4
+# close(): so lan flush lai khi con dong loi tam thoi (database bi khoa...)
+CLOSE_RETRIES = 5
+
+
+class WriteBuffer:
+    """Gom save_product / touch_product / log_crawl, ghi theo lo tren thread nen
+
+    `on_flush(logs)` (tuy chon) duoc goi sau moi lan commit voi cac dong
+    crawl_history vua ghi - dung de danh dau checkpoint chi khi du lieu da
+    nam tren dia. Dong loi tam thoi duoc giu lai cho lan flush sau.
+    """
+
+    def __init__(self, max_rows=WRITE_BUFFER_ROWS, interval_ms=WRITE_BUFFER_MS, on_flush=None):
+        self.max_rows = max(1, max_rows)
+        self.interval = interval_ms / 1000
+        self.on_flush = on_flush
+        self._products = []
+        self._touches = []
+        self._logs = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='write-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def save_product(self, product, updated_at=None):
+        self._add('_products', {**product, 'updated_at': updated_at or datetime.now()})
+
+    def touch_product(self, url, validators=None):
+        self._add('_touches', (url, validators, datetime.now()))
+
+    def log_crawl(self, url, status, message='', error_class=None, attempts=1, duration_ms=None, timings=None):
+        self._add('_logs', (url, status, message, error_class, attempts, duration_ms, timings))
+
+    def pending(self):
+        return len(self._products) + len(self._touches) + len(self._logs)
+
+    def _add(self, queue, item):
+        # Lay list trong lock: flush() co the vua doi list moi
+        with self._lock:
+            getattr(self, queue).append(item)
+            pending = self.pending()
+            closed = self._closed
+        if closed or pending >= self.max_rows * BACKPRESSURE_FACTOR:
+            # Loi ghi khong duoc thanh loi crawl cua URL dang goi
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[write-buffer] Loi ghi database: {e}")
+        elif pending >= self.max_rows:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[write-buffer] Loi ghi database: {e}")
+        # Connection SQLite cua thread nen (get_db theo thread) khong con ai dung
+        close_db()
+
+    def flush(self):
+        """Ghi het hang doi hien tai (moi loai mot transaction), tra ve so dong da ghi"""
+        with self._flush_lock:
+            with self._lock:
+                products, self._products = self._products, []
+                touches, self._touches = self._touches, []
+                logs, self._logs = self._logs, []
+            if not (products or touches or logs):
+                return 0
+
+            start = time.perf_counter()
+            products, dropped = self._write('_products', save_products, products)
+            touches, dropped_touches = self._write('_touches', touch_products, touches)
+            # Dong bi bo thi log crawl cua URL do thanh loi: checkpoint ghi failed, resume crawl lai
+            failed = {p['url']: error for p, error in dropped}
+            failed.update((t[0], error) for t, error in dropped_touches)
+            if failed:
+                logs = [(log[0], 'error', f'Khong ghi duoc database: {failed[log[0]]}', UNKNOWN) + log[4:]
+                        if log[0] in failed else log for log in logs]
+            # Log cua URL con cho ghi lai cung doi theo: on_flush chi danh dau URL da du du lieu
+            with self._lock:
+                waiting = {p['url'] for p in self._products} | {t[0] for t in self._touches}
+            if waiting:
+                self._requeue('_logs', [log for log in logs if log[0] in waiting])
+                logs = [log for log in logs if log[0] not in waiting]
+            logs, _ = self._write('_logs', log_crawls, logs)
+            record(None, 'db_flush', time.perf_counter() - start)
+
+            # Trong _flush_lock: checkpoint theo dung thu tu commit
+            if self.on_flush and logs:
+                try:
+                    self.on_flush(logs)
+                except Exception as e:
+                    print(f"[write-buffer] on_flush loi: {e}")
+        return len(products) + len(touches) + len(logs)
+
+    def _write(self, queue, write, rows):
+        """Ghi mot loai dong theo lo, tra ve (dong da commit, [(dong bi bo, loi)])
+
+        Loi tam thoi (sqlite3.OperationalError: database bi khoa, dia day...)
+        thi tra dong lai hang doi cho lan flush sau. Loi khac thi ghi lai tung
+        dong de mot dong hong khong lam mat ca lo; dong van loi bi bo qua.
+        """
+        if not rows:
+            return rows, []
+        try:
+            write(rows)
+            return rows, []
+        except sqlite3.OperationalError as e:
+            print(f"[write-buffer] Ghi {len(rows)} dong {queue[1:]} loi ({e}), ghi lai lan sau")
+            self._requeue(queue, rows)
+            return [], []
+        except Exception as e:
+            print(f"[write-buffer] Ghi lo {len(rows)} dong {queue[1:]} loi ({e}), ghi tung dong")
+
+        written, retry, dropped = [], [], []
+        for row in rows:
+            try:
+                write([row])
+                written.append(row)
+            except sqlite3.OperationalError:
+                retry.append(row)
+            except Exception as e:
+                print(f"[write-buffer] Bo qua dong {queue[1:]} loi: {e}")
+                dropped.append((row, e))
+        self._requeue(queue, retry)
+        return written, dropped
+
+    def _requeue(self, queue, rows):
+        """Dua dong ghi loi ve dau hang doi (giu thu tu ghi)"""
+        if rows:
+            with self._lock:
+                getattr(self, queue)[:0] = rows
+
+    def close(self):
+        """Dung thread nen va flush phan con lai (goi lai khong sao)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=30)
+        for attempt in range(CLOSE_RETRIES):
+            self.flush()
+            if not self.pending():
+                return
+            time.sleep(2 ** attempt * 0.1)
+        print(f"[write-buffer] Con {self.pending()} dong chua ghi duoc khi dong")
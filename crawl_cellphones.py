@@ -1,202 +1,177 @@
 """
 Script cao san pham laptop tu CellphoneS - Lay TAT CA thong so ky thuat
-Su dung Playwright de click nut "Xem tat ca"
+Su dung Playwright (async) de click nut "Xem tat ca", nhieu tab song song
 """
 
 import sys
 import io
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
+import argparse
+import asyncio
 import json
-import re
-import time
-from playwright.sync_api import sync_playwright
+import os
 
+# Engine crawl dung chung voi web app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cellphones-web'))
+from crawl_engine import CrawlEngine, CONCURRENCY
+from crawl_errors import CrawlError, classify, with_retries_async
+from crawl_output import NDJSONWriter, is_ndjson_path
+from crawl_state import CrawlState
+from http_client import CRAWL_MODE, fetch_product_http
+from product_parser import extract_brand, extract_sku_from_url
 
-def crawl_10_products():
-    """Cao 10 san pham dau tien tu trang laptop CellphoneS"""
-
-    print("[*] Khoi dong trinh duyet...")
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        )
-        page = context.new_page()
-
-        # Vao trang danh sach laptop
-        url = "https://cellphones.com.vn/laptop.html"
-        print(f"[*] Dang truy cap: {url}")
-        page.goto(url, wait_until='networkidle', timeout=60000)
-
-        # Doi trang load xong
-        page.wait_for_selector('.product-info-container', timeout=30000)
-
-        # Lay danh sach san pham
-        product_items = page.query_selector_all('.product-info-container')
-        print(f"[+] Tim thay {len(product_items)} san pham")
 
-        results = []
+LISTING_URL = "https://cellphones.com.vn/laptop.html"
 
-        # Lay 10 san pham dau tien
-        for i in range(min(10, len(product_items))):
-            item = product_items[i]
 
-            # Lay thong tin co ban
-            link_el = item.query_selector('a.product__link')
-            if not link_el:
-                continue
+def state_job(url):
+    """Id checkpoint cua mot trang danh sach"""
+    return f"cellphones:{url}"
 
-            product_url = link_el.get_attribute('href')
-            name_el = item.query_selector('.product__name h3')
-            name = name_el.inner_text() if name_el else ''
 
-            img_el = item.query_selector('.product__img')
-            image = img_el.get_attribute('src') if img_el else ''
-
-            price_el = item.query_selector('.product__price--show')
-            price_text = price_el.inner_text() if price_el else '0'
-            price = parse_price(price_text)
-
-            original_el = item.query_selector('.product__price--through')
-            original_text = original_el.inner_text() if original_el else price_text
-            original_price = parse_price(original_text)
-
-            discount_el = item.query_selector('.product__price--percent-detail span')
-            discount = f"-{discount_el.inner_text()}" if discount_el else ''
-
-            print(f"\n[{i+1}] {name[:60]}...")
-            print(f"    Gia: {price:,}d (Goc: {original_price:,}d) {discount}")
-
-            # Vao trang chi tiet de lay FULL thong so
-            print(f"    [*] Dang lay thong so ky thuat...")
-            specs = get_full_specs(context, product_url)
+def crawl_10_products():
+    """Cao 10 san pham dau tien tu trang laptop CellphoneS"""
+    return asyncio.run(crawl_products(limit=10))
 
-            product = {
-                'stt': i + 1,
-                'sku': extract_sku_from_url(product_url),
-                'name': name,
-                'brand': extract_brand(name),
-                'price': price,
-                'original_price': original_price,
-                'discount': discount,
-                'image': image,
-                'url': product_url,
-                'in_stock': True,
-                'specs': specs,
-            }
-            results.append(product)
 
-            print(f"    URL: {product_url}")
-            print(f"    [+] Da lay {len(specs)} thong so")
+async def crawl_products(url=LISTING_URL, limit=10, concurrency=CONCURRENCY, on_product=None, state=None,
+                         flush=None):
+    """Cao `limit` san pham (None = ca danh muc), lay thong so song song
 
-        browser.close()
+    Neu co `on_product`, moi san pham duoc chuyen cho callback ngay khi xong
+    (khong giu trong bo nho) va ham tra ve so san pham thay vi danh sach.
+    Neu co `state` (CrawlState), URL da xong o lan chay truoc se bo qua;
+    URL chi duoc danh dau sau khi san pham da ghi ra va `flush()` (neu co).
+    """
 
-    return results
+    print("[*] Khoi dong trinh duyet...")
 
+    results = []
+    count = 0
 
-def get_full_specs(context, product_url):
+    async with CrawlEngine(concurrency=concurrency) as engine:
+        # Vao trang danh sach
+        print(f"[*] Dang truy cap: {url}")
+        items = await engine.fetch_listing(url, limit)
+        print(f"[+] Tim thay {len(items)} san pham")
+
+        numbered = list(enumerate(items, start=1))
+        if state:
+            job_id = state_job(url)
+            state.start_job(job_id, [item['url'] for item in items], concurrency, source='cli')
+            remaining = set(state.remaining(job_id))
+            numbered = [(stt, item) for stt, item in numbered if item['url'] in remaining]
+            print(f"[*] Resume: bo qua {len(items) - len(numbered)} san pham da xong")
+
+        # Vao trang chi tiet de lay FULL thong so - nhieu tab cung luc
+        print(f"[*] Dang lay thong so ky thuat ({engine.concurrency} tab song song)...")
+        tasks = [crawl_item(engine, stt, item) for stt, item in numbered]
+        for task in asyncio.as_completed(tasks):
+            product = await task
+            count += 1
+
+            print(f"\n[{product['stt']}] {product['name'][:60]}...")
+            print(f"    Gia: {product['price']:,}d (Goc: {product['original_price']:,}d) {product['discount']}")
+            print(f"    URL: {product['url']}")
+            print(f"    [+] Da lay {len(product['specs'])} thong so")
+
+            if on_product:
+                on_product(product)
+            else:
+                results.append(product)
+            if state:
+                # Checkpoint sau khi du lieu da nam tren dia, chet giua chung khong mat san pham
+                if flush:
+                    flush()
+                state.mark(job_id, product['url'], bool(product['specs']))
+
+    if state:
+        state.finish_job(job_id)
+    if on_product:
+        return count
+    return sorted(results, key=lambda p: p['stt'])
+
+
+async def crawl_item(engine, stt, item):
+    """Lay thong so cho mot san pham tren trang danh sach"""
+    specs = await get_full_specs(engine, item['url'])
+    return {
+        'stt': stt,
+        'sku': extract_sku_from_url(item['url']),
+        'name': item['name'],
+        'brand': extract_brand(item['name']),
+        'price': item['price'],
+        'original_price': item['original_price'],
+        'discount': item['discount'],
+        'image': item['image'],
+        'url': item['url'],
+        'in_stock': True,
+        'specs': specs,
+    }
+
+
+async def get_full_specs(engine, product_url):
     """Lay TAT CA thong so ky thuat bang cach click nut 'Xem tat ca'"""
-    specs = {}
-
+    # Thu HTTP truoc, khong co thong so trong HTML moi mo tab
+    if CRAWL_MODE != 'browser':
+        try:
+            product = await asyncio.to_thread(fetch_product_http, product_url)
+            if product['specs'] or CRAWL_MODE == 'http':
+                return product['specs']
+        except Exception as e:
+            if CRAWL_MODE == 'http':
+                print(f"    [!] Loi {classify(e).kind} {product_url}: {e}")
+                return {}
+
+    # Timeout / bi chan thi thu lai voi backoff, 404 thi bo qua ngay
     try:
-        page = context.new_page()
-        page.goto(product_url, wait_until='networkidle', timeout=60000)
-
-        # Doi cho phan thong so load
-        page.wait_for_selector('.technical-content', timeout=10000)
-
-        # Tim va click nut "Xem tat ca thong so"
-        show_all_btn = page.query_selector('.button__show-modal-technical')
-        if show_all_btn:
-            show_all_btn.click()
-            # Doi modal hien ra
-            time.sleep(1)
-
-            # Tim modal chua thong so day du
-            modal = page.query_selector('.modal.is-active, [class*="modal"][class*="active"], .modal-technical')
-            if modal:
-                # Lay tat ca row trong modal
-                rows = modal.query_selector_all('tr')
-                for row in rows:
-                    cols = row.query_selector_all('td')
-                    if len(cols) >= 2:
-                        key = cols[0].inner_text().strip()
-                        value = cols[1].inner_text().strip()
-                        if key and value:
-                            specs[key] = value
-            else:
-                # Neu khong tim thay modal, thu lay tu trang chinh
-                specs = get_specs_from_page(page)
-        else:
-            # Khong co nut xem tat ca, lay tu trang chinh
-            specs = get_specs_from_page(page)
-
-        page.close()
-
-    except Exception as e:
-        print(f"    [!] Loi: {e}")
-
-    return specs
-
-
-def get_specs_from_page(page):
-    """Lay thong so tu trang hien tai"""
-    specs = {}
-
-    rows = page.query_selector_all('.technical-content tr, .technical-content-item')
-    for row in rows:
-        cols = row.query_selector_all('td')
-        if len(cols) >= 2:
-            key = cols[0].inner_text().strip()
-            value = cols[1].inner_text().strip()
-            if key and value:
-                specs[key] = value
-
-    return specs
-
-
-def parse_price(price_text):
-    """Chuyen doi text gia thanh so"""
-    numbers = re.sub(r'[^\d]', '', price_text)
-    return int(numbers) if numbers else 0
-
-
-def extract_sku_from_url(url):
-    """Lay SKU tu URL"""
-    if url:
-        slug = url.split('/')[-1].replace('.html', '')
-        return slug
-    return ''
-
-
-def extract_brand(name):
-    """Lay brand tu ten san pham"""
-    brands = ['Dell', 'HP', 'Lenovo', 'Asus', 'Acer', 'MSI', 'Apple', 'MacBook',
-              'Samsung', 'LG', 'Huawei', 'Microsoft', 'Gigabyte', 'Razer']
-    name_lower = name.lower()
-    for brand in brands:
-        if brand.lower() in name_lower:
-            return brand
-    return ''
+        specs, _ = await with_retries_async(engine.fetch_specs, product_url)
+        return specs
+    except CrawlError as e:
+        print(f"    [!] Loi {e.kind} sau {e.attempts} lan {product_url}: {e}")
+        return {}
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Crawl san pham CellphoneS')
+    parser.add_argument('--url', default=LISTING_URL, help='Trang danh sach can crawl')
+    parser.add_argument('--limit', type=int, default=10, help='So san pham (0 = ca danh muc)')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='So tab song song')
+    parser.add_argument('--output', default='cellphones_10_products.json',
+                        help='File ket qua; .ndjson/.jsonl(.gz) = ghi stream tung san pham')
+    parser.add_argument('--resume', action='store_true',
+                        help='Bo qua san pham da xong o lan chay truoc (dung voi --output .ndjson)')
+    parser.add_argument('--state', default='crawl_state.db', help='File SQLite luu trang thai crawl')
+    args = parser.parse_args()
+    # Checkpoint chi co nghia khi ket qua duoc ghi dan ra file (.ndjson)
+    state = CrawlState(args.state) if args.resume and is_ndjson_path(args.output) else None
+    if args.resume and not state:
+        print("[!] --resume chi dung voi --output .ndjson / .jsonl, crawl lai tu dau")
+    # Lan truoc da chay xong thi bat dau lai tu dau (ghi de file ket qua)
+    resuming = bool(state) and state.is_unfinished(state_job(args.url))
+
     print("=" * 60)
-    print("CELLPHONES CRAWLER - LAY 10 SAN PHAM + FULL THONG SO")
+    print(f"CELLPHONES CRAWLER - LAY {args.limit or 'TAT CA'} SAN PHAM + FULL THONG SO")
     print("=" * 60)
 
-    products = crawl_10_products()
+    if is_ndjson_path(args.output):
+        with NDJSONWriter(args.output, append=resuming) as writer:
+            count = asyncio.run(crawl_products(args.url, args.limit or None, args.concurrency, writer.write, state,
+                                               writer.flush))
+        print(f"\n[+] Da ghi {count} san pham vao file: {args.output}")
+        sys.exit(0 if count else 1)
+
+    products = asyncio.run(crawl_products(args.url, args.limit or None, args.concurrency))
 
     if products:
         print(f"\n{'=' * 60}")
         print(f"DA LAY DUOC {len(products)} SAN PHAM")
         print("=" * 60)
 
-        with open('cellphones_10_products.json', 'w', encoding='utf-8') as f:
+        with open(args.output, 'w', encoding='utf-8') as f:
             json.dump(products, f, ensure_ascii=False, indent=2)
-        print("\n[+] Da luu vao file: cellphones_10_products.json")
+        print(f"\n[+] Da luu vao file: {args.output}")
 
         # Hien thi thong so san pham dau tien
         print("\n[SAMPLE] Thong so san pham dau tien:")
@@ -0,0 +1,79 @@
+"""
+Ghi ket qua crawl dang NDJSON (moi dong mot san pham), tuy chon gzip
+
+Ghi ngay khi lay duoc tung san pham va flush dinh ky, nen bo nho khong
+tang theo so san pham, chet giua chung van giu duoc phan da crawl, va
+loader phia sau co the tail file trong khi crawl dang chay.
+"""
+
+import gzip
+import json
+import time
+
+
+class NDJSONWriter:
+    """Ghi tung record JSON vao file .ndjson / .jsonl (.gz)
+
+    Mac dinh ghi de file cu; append=True (khi resume) ghi tiep vao cuoi.
+    """
+
+    def __init__(self, path, flush_every=20, flush_interval=5.0, append=False):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        mode = 'a' if append else 'w'
+        if path.endswith('.gz'):
+            self._file = gzip.open(path, mode + 't', encoding='utf-8')
+        else:
+            self._file = open(path, mode, encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, record):
+        """Ghi mot record, flush sau N record hoac T giay"""
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+        self._pending += 1
+        if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Day du lieu xuong dia (gzip: sync flush de doc duoc ngay)"""
+        self._file.flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def is_ndjson_path(path):
+    """File output co phai dang stream (.ndjson / .jsonl, co the .gz)"""
+    name = path[:-3] if path.endswith('.gz') else path
+    return name.endswith(('.ndjson', '.jsonl'))
+
+
+def load_seen_skus(path):
+    """Doc SKU da ghi trong file NDJSON (de resume khong ghi trung)"""
+    seen = set()
+    try:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    seen.add(json.loads(line).get('sku'))
+                except ValueError:
+                    # Dong cuoi co the bi cat do process chet giua chung
+                    continue
+    except FileNotFoundError:
+        pass
+    return seen
@@ -1,124 +1,331 @@
 """
-Script cao san pham laptop tu Phong Vu - Version don gian
+Script cao san pham tu Phong Vu - doc __NEXT_DATA__ (khong can browser)
+Co che do lay toan bo catalog: moi danh muc, moi trang, fetch song song
 """
 
-import requests
+import argparse
 import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 
+from crawl_output import NDJSONWriter, is_ndjson_path, load_seen_skus
 
-def crawl_10_products():
-    """Cao 10 san pham dau tien tu trang laptop Phong Vu"""
+# Dung chung CrawlState voi web app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cellphones-web'))
+from crawl_errors import NOT_FOUND, PARSE_MISS, CrawlError, status_error, with_retries
+from crawl_state import CrawlState
+from http_client import rate_limited_get
+from snapshots import NEXT_DATA, save_snapshot
 
-    url = "https://phongvu.vn/c/laptop"
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-    }
+BASE_URL = "https://phongvu.vn"
 
-    print(f"[*] Dang fetch: {url}")
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+# Danh muc mac dinh; khi crawl ca catalog se them danh muc tim thay trong __NEXT_DATA__
+DEFAULT_CATEGORIES = ['/c/laptop']
+WORKERS = 8
+MAX_PAGES = 200
 
-    response = requests.get(url, headers=headers, timeout=30)
-    print(f"[*] Status: {response.status_code}")
+STATE_JOB = 'phongvu:catalog'
 
+CATEGORY_RE = re.compile(r'^(?:https://phongvu\.vn)?(/c/[\w-]+)/?$')
+
+
+def make_session(workers=WORKERS):
+    """Session dung chung - giu keep-alive, pool du lon cho cac thread"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    # Khong retry o tang urllib3: with_retries lo thu lai (backoff + rate limiter)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def fetch_page_props(session, url, strict=False):
+    """Lay pageProps tu __NEXT_DATA__ cua mot trang (None neu loi)
+
+    strict=True: raise CrawlError thay vi tra ve None, de goi qua with_retries.
+    """
+    # Rate limit theo host, tu giam toc khi bi 429/503
+    response = rate_limited_get(session, url, timeout=30)
     if response.status_code != 200:
-        print(f"[!] Loi: {response.status_code}")
-        return []
+        if strict:
+            raise status_error(response.status_code, url) or CrawlError(PARSE_MISS, f'HTTP {response.status_code}: {url}')
+        print(f"[!] Loi {response.status_code}: {url}")
+        return None
 
     soup = BeautifulSoup(response.text, 'html.parser')
 
     # Tim __NEXT_DATA__ (Next.js stores data here)
     script_tag = soup.find('script', {'id': '__NEXT_DATA__'})
+    if not script_tag:
+        if strict:
+            raise CrawlError(PARSE_MISS, f'Khong tim thay __NEXT_DATA__: {url}')
+        print(f"[!] Khong tim thay __NEXT_DATA__: {url}")
+        return None
+
+    save_snapshot(url, NEXT_DATA, script_tag.string)
+    data = json.loads(script_tag.string)
+    return data.get('props', {}).get('pageProps', {})
+
+
+def find_products(page_props):
+    """Tim danh sach san pham trong pageProps (thu cac duong dan khac nhau)"""
+    # Thu 1: serverProducts (Phong Vu dung cai nay)
+    products = page_props.get('serverProducts', [])
+
+    # Thu 2: productListing.products
+    if not products:
+        products = page_props.get('productListing', {}).get('products', [])
+
+    # Thu 3: products truc tiep
+    if not products:
+        products = page_props.get('products', [])
+
+    return products or []
+
+
+def find_categories(page_props):
+    """Tim tat ca duong dan danh muc /c/... xuat hien trong pageProps"""
+    found = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+        elif isinstance(node, str):
+            match = CATEGORY_RE.match(node)
+            if match:
+                found.add(match.group(1))
+
+    walk(page_props)
+    return found
+
+
+def parse_product(p):
+    """Chuyen product trong __NEXT_DATA__ sang dict chung"""
+    price_data = p.get('price', {})
+    price = price_data.get('latestPrice', 0)
+    original = price_data.get('supplierRetailPrice', price)
+    discount = price_data.get('discountPercent', '')
+
+    # Lay URL tu link.as.pathname
+    link_data = p.get('link', {}).get('as', {})
+    url_path = link_data.get('pathname', '')
+
+    return {
+        'sku': p.get('sku', ''),
+        'name': p.get('name', ''),
+        'brand': p.get('brand', {}).get('name', ''),
+        'price': price,
+        'original_price': original,
+        'discount': discount,
+        'image': p.get('imageUrl', ''),
+        'url': f"{BASE_URL}{url_path}",
+        'in_stock': p.get('stockQuantity', 0) > 0,
+    }
+
+
+def fetch_listing_page(session, category, page):
+    """Fetch mot trang danh sach, tra ve (products, pageProps)
+
+    Loi tam thoi duoc thu lai; van loi thi products = None (khac voi trang
+    rong / 404 = het danh muc).
+    """
+    url = f"{BASE_URL}{category}?page={page}"
+    try:
+        page_props, _ = with_retries(fetch_page_props, session, url, strict=True)
+    except CrawlError as e:
+        if e.kind == NOT_FOUND:
+            return [], {}
+        print(f"[!] Loi {e.kind} sau {e.attempts} lan {url}: {e}")
+        return None, {}
+    return [parse_product(p) for p in find_products(page_props)], page_props
 
-    if script_tag:
-        print("[+] Tim thay __NEXT_DATA__")
-        data = json.loads(script_tag.string)
 
+def crawl_category(session, executor, category, seen, emit, workers=WORKERS, max_pages=MAX_PAGES):
+    """Crawl moi trang cua mot danh muc, fetch tung dot `workers` trang song song
+
+    San pham moi (SKU chua co trong `seen`) duoc chuyen cho `emit` ngay sau
+    moi dot, tra ve (so san pham moi, cac danh muc tim thay, cac trang loi).
+    Danh muc chi day du khi khong co trang loi.
+    """
+    total = 0
+    categories = set()
+    failed = []
+    page = 1
+
+    while page <= max_pages:
+        pages = range(page, min(page + workers, max_pages + 1))
+        batch = list(executor.map(lambda n: fetch_listing_page(session, category, n), pages))
+
+        new_count = 0
+        for n, (page_products, page_props) in zip(pages, batch):
+            if page_products is None:
+                failed.append(n)
+                continue
+            for product in page_products:
+                # Cung SKU o nhieu trang / danh muc - giu ban dau tien
+                if product['sku'] and product['sku'] not in seen:
+                    seen.add(product['sku'])
+                    emit(product)
+                    new_count += 1
+            categories |= find_categories(page_props)
+        total += new_count
+
+        # Gap trang rong (hoac trang lap lai trang cu) la da het danh muc;
+        # trang loi khong tinh la trang rong
+        if new_count == 0 or any(page_products == [] for page_products, _ in batch):
+            break
+        page += workers
+
+    if failed:
+        print(f"[!] {category}: {total} san pham, loi trang {failed} - chua xong")
+    else:
+        print(f"[+] {category}: {total} san pham")
+    return total, categories, failed
+
+
+def crawl_catalog(categories=None, discover=True, workers=WORKERS, max_pages=MAX_PAGES, on_product=None,
+                  state=None, seen=None, flush=None):
+    """Crawl toan bo catalog: moi danh muc (tu tim them neu discover), moi trang
+
+    Neu co `on_product`, san pham duoc ghi ra ngay (khong giu trong bo nho)
+    va ham tra ve tong so san pham thay vi danh sach. Neu co `state`
+    (CrawlState), checkpoint theo danh muc: danh muc da xong se bo qua khi
+    chay lai; `seen` la cac SKU da ghi o lan truoc. `flush` (tuy chon) duoc
+    goi truoc moi checkpoint de san pham cua danh muc da nam tren dia.
+    """
+    pending = list(categories or DEFAULT_CATEGORIES)
+    visited = set()
+    seen = set(seen or ())
+    results = []
+    total = 0
+
+    if state:
+        state.start_job(STATE_JOB, pending, workers, source='cli')
+        pending = state.remaining(STATE_JOB)
+        if not pending:
+            print("[*] Resume: tat ca danh muc da xong")
+
+    session = make_session(workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending:
+            category = pending.pop(0)
+            if category in visited:
+                continue
+            visited.add(category)
+
+            count, found, failed = crawl_category(session, executor, category, seen,
+                                                  on_product or results.append, workers, max_pages)
+            total += count
+
+            new_categories = sorted(found - visited) if discover else []
+            pending.extend(new_categories)
+            if state:
+                if flush:
+                    flush()
+                # Ghi danh muc moi truoc khi danh dau xong, restart khong bi mat
+                state.start_job(STATE_JOB, new_categories, workers, source='cli')
+                # Co trang loi thi de 'failed', resume se crawl lai danh muc
+                state.mark(STATE_JOB, category, not failed, f'Loi trang {failed}' if failed else '')
+
+    if state:
+        state.finish_job(STATE_JOB)
+
+    return total if on_product else results
+
+
+def crawl_10_products():
+    """Cao 10 san pham dau tien tu trang laptop Phong Vu"""
+
+    url = f"{BASE_URL}/c/laptop"
+    print(f"[*] Dang fetch: {url}")
+
+    page_props = fetch_page_props(make_session(), url)
+    if page_props is None:
+        return []
+
+    print(f"[DEBUG] pageProps keys: {list(page_props.keys())}")
+    products = find_products(page_props)
+
+    if not products:
         # Luu ra file de debug
         with open('debug_next_data.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print("[+] Da luu __NEXT_DATA__ vao debug_next_data.json")
-
-        # In cac keys de tim duong dan
-        page_props = data.get('props', {}).get('pageProps', {})
-        print(f"[DEBUG] pageProps keys: {list(page_props.keys())}")
-
-        # Thu cac duong dan khac nhau
-        products = []
-
-        # Thu 1: serverProducts (Phong Vu dung cai nay)
-        products = page_props.get('serverProducts', [])
-        if products:
-            print(f"[+] Found in serverProducts: {len(products)}")
-
-        # Thu 2: productListing.products
-        if not products:
-            products = page_props.get('productListing', {}).get('products', [])
-            if products:
-                print(f"[+] Found in productListing.products: {len(products)}")
-
-        # Thu 3: products truc tiep
-        if not products:
-            products = page_props.get('products', [])
-            if products:
-                print(f"[+] Found in products: {len(products)}")
-
-        if products:
-            results = []
-            for i, p in enumerate(products[:10]):
-                price_data = p.get('price', {})
-                price = price_data.get('latestPrice', 0)
-                original = price_data.get('supplierRetailPrice', price)
-                discount = price_data.get('discountPercent', '')
-
-                # Lay URL tu link.as.pathname
-                link_data = p.get('link', {}).get('as', {})
-                url_path = link_data.get('pathname', '')
-
-                product = {
-                    'stt': i + 1,
-                    'sku': p.get('sku', ''),
-                    'name': p.get('name', ''),
-                    'brand': p.get('brand', {}).get('name', ''),
-                    'price': price,
-                    'original_price': original,
-                    'discount': discount,
-                    'image': p.get('imageUrl', ''),
-                    'url': f"https://phongvu.vn{url_path}",
-                    'in_stock': p.get('stockQuantity', 0) > 0,
-                }
-                results.append(product)
-                print(f"\n[{i+1}] {product['name'][:60]}...")
-                print(f"    SKU: {product['sku']} | Brand: {product['brand']}")
-                print(f"    Gia: {price:,}d (Goc: {original:,}d) {discount}")
-                print(f"    URL: {product['url']}")
-
-            return results
-        else:
-            print("[!] Khong tim thay products trong NEXT_DATA")
-            return []
-    else:
-        print("[!] Khong tim thay __NEXT_DATA__")
+            json.dump(page_props, f, ensure_ascii=False, indent=2)
+        print("[!] Khong tim thay products trong NEXT_DATA")
         return []
 
+    results = []
+    for i, p in enumerate(products[:10]):
+        product = {'stt': i + 1, **parse_product(p)}
+        results.append(product)
+        print(f"\n[{i+1}] {product['name'][:60]}...")
+        print(f"    SKU: {product['sku']} | Brand: {product['brand']}")
+        print(f"    Gia: {product['price']:,}d (Goc: {product['original_price']:,}d) {product['discount']}")
+        print(f"    URL: {product['url']}")
+
+    return results
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Crawl san pham Phong Vu')
+    parser.add_argument('--all', action='store_true', help='Lay toan bo catalog thay vi 10 san pham')
+    parser.add_argument('--category', action='append', help='Duong dan danh muc, vd /c/laptop (lap lai duoc)')
+    parser.add_argument('--no-discover', action='store_true', help='Khong tu tim them danh muc')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='So request song song')
+    parser.add_argument('--max-pages', type=int, default=MAX_PAGES, help='So trang toi da moi danh muc')
+    parser.add_argument('--output', help='File ket qua; .ndjson/.jsonl(.gz) = ghi stream tung san pham')
+    parser.add_argument('--resume', action='store_true',
+                        help='Bo qua danh muc da xong o lan chay truoc (dung voi --all --output .ndjson)')
+    parser.add_argument('--state', default='crawl_state.db', help='File SQLite luu trang thai crawl')
+    args = parser.parse_args()
+
     print("=" * 60)
-    print("PHONG VU CRAWLER - LAY 10 SAN PHAM")
+    print("PHONG VU CRAWLER - " + ("LAY TOAN BO CATALOG" if args.all else "LAY 10 SAN PHAM"))
     print("=" * 60)
 
-    products = crawl_10_products()
+    output = args.output or ('phongvu_products.json' if args.all else 'phongvu_10_products.json')
+
+    if args.all and is_ndjson_path(output):
+        state = CrawlState(args.state) if args.resume else None
+        # Lan truoc da chay xong thi bat dau lai tu dau (ghi de file ket qua)
+        resuming = bool(state) and state.is_unfinished(STATE_JOB)
+        seen = load_seen_skus(output) if resuming else None
+        with NDJSONWriter(output, append=resuming) as writer:
+            count = crawl_catalog(args.category, not args.no_discover, args.workers, args.max_pages,
+                                  writer.write, state, seen, writer.flush)
+        print(f"\n[+] Da ghi {count} san pham vao file: {output}")
+        raise SystemExit(0 if count else 1)
+
+    if args.all:
+        products = crawl_catalog(args.category, not args.no_discover, args.workers, args.max_pages)
+    else:
+        products = crawl_10_products()
 
     if products:
         print(f"\n{'=' * 60}")
         print(f"DA LAY DUOC {len(products)} SAN PHAM")
         print("=" * 60)
 
-        with open('phongvu_10_products.json', 'w', encoding='utf-8') as f:
+        with open(output, 'w', encoding='utf-8') as f:
             json.dump(products, f, ensure_ascii=False, indent=2)
-        print("\n[+] Da luu vao file: phongvu_10_products.json")
+        print(f"\n[+] Da luu vao file: {output}")
     else:
         print("\n[!] Khong lay duoc san pham")
         print("[*] Kiem tra file debug_next_data.json de xem cau truc data")
@@ -0,0 +1,228 @@
+"""
+Crawl nhieu URL CellphoneS bang nhieu process (moi process mot Chromium)
+
+Chia danh sach URL (CSV, sitemap, trang danh sach hoac tham so) thanh N
+shard, moi shard chay trong mot process rieng voi browser pool rieng nen
+render + parse dung het cac core. Process con chi crawl va gui ket qua ve;
+process chinh la noi duy nhat ghi products.db (khong tranh chap khoa ghi),
+ghi theo lo qua WriteBuffer.
+
+    python crawl_sharded.py --csv cellphones-web/template_urls.csv --processes 8
+    python crawl_sharded.py --sitemap https://cellphones.com.vn/sitemap.xml --processes 8 --resume
+    python crawl_sharded.py --listing https://cellphones.com.vn/laptop.html --limit 500
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import hashlib
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cellphones-web'))
+from browser_pool import POOL_SIZE
+
+
+LOC_RE = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>')
+
+
+def urls_from_csv(path):
+    """Cot URL / url trong CSV (khong co header thi lay o dau tien bat dau bang http)"""
+    urls = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.reader(f):
+            url = next((cell.strip() for cell in row if cell.strip().startswith('http')), None)
+            if url:
+                urls.append(url)
+    return urls
+
+
+def urls_from_sitemap(source, max_depth=3):
+    """URL trang san pham trong sitemap (file hoac URL, ho tro sitemap index va .gz)"""
+    from http_client import get_session, rate_limited_get
+
+    if source.startswith('http'):
+        response = rate_limited_get(get_session(), source, timeout=60)
+        response.raise_for_status()
+        data = response.content
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    text = data.decode('utf-8', errors='replace')
+    locs = LOC_RE.findall(text)
+
+    if '<sitemapindex' in text and max_depth > 0:
+        urls = []
+        for loc in locs:
+            urls.extend(urls_from_sitemap(loc, max_depth - 1))
+        return urls
+    # Chi lay trang chi tiet san pham
+    return [loc for loc in locs if loc.endswith('.html')]
+
+
+def urls_from_listing(url, limit=None):
+    """URL san pham tren trang danh sach (bam 'Xem them' bang Chromium)"""
+    from crawl_engine import CrawlEngine
+
+    async def run():
+        async with CrawlEngine(concurrency=1) as engine:
+            return await engine.fetch_listing(url, limit)
+
+    return [urljoin(url, item['url']) for item in asyncio.run(run())]
+
+
+def split_shards(urls, count):
+    """Chia xen ke (URL cung danh muc thuong dung canh nhau, chia deu viec nang / nhe)"""
+    return [shard for shard in (urls[i::count] for i in range(count)) if shard]
+
+
+def shard_rate_env(count):
+    """Bien moi truong rate limit cho process con: chia toc do moi host cho `count` process
+
+    Moi process co limiter rieng, khong chia thi tong toc do toi mot site
+    gap `count` lan RATE_LIMIT_RPS (va RATE_LIMIT_MAX_RPS khi AIMD tang toc).
+    """
+    from rate_limit import RATE_LIMIT_BURST, RATE_LIMIT_MAX_RPS, RATE_LIMIT_MIN_RPS, RATE_LIMIT_RPS
+
+    if RATE_LIMIT_RPS <= 0:
+        return {}
+    return {name: str(value / count) for name, value in (
+        ('RATE_LIMIT_RPS', RATE_LIMIT_RPS), ('RATE_LIMIT_MAX_RPS', RATE_LIMIT_MAX_RPS),
+        ('RATE_LIMIT_MIN_RPS', RATE_LIMIT_MIN_RPS), ('RATE_LIMIT_BURST', RATE_LIMIT_BURST))}
+
+
+def run_shard(index, urls, threads, force, results):
+    """Process con: crawl mot shard, gui tung ket qua ve process chinh"""
+    from crawler import browser_pool, crawl_url
+
+    try:
+        with ThreadPoolExecutor(threads) as executor:
+            futures = [executor.submit(crawl_url, url, force) for url in urls]
+            for future in as_completed(futures):
+                results.put(future.result())
+    finally:
+        browser_pool.close()
+        results.put(('done', index))
+
+
+def crawl_sharded(urls, processes, threads=POOL_SIZE, force=False, state=None, job_id=None):
+    """Crawl `urls` tren `processes` process, ghi ket qua tu process nay; tra ve thong ke"""
+    from crawler import store_result
+    from write_buffer import WriteBuffer
+
+    # Checkpoint chi danh dau URL khi ket qua da commit xuong products.db
+    def on_flush(logs):
+        state.mark_many(job_id, [(log[0], log[1] != 'error', log[2]) for log in logs])
+    buffer = WriteBuffer(on_flush=on_flush if state else None)
+
+    shards = split_shards(urls, processes)
+    ctx = multiprocessing.get_context('spawn')
+    # Gioi han hang doi de process con khong chay qua xa so voi luong ghi
+    results = ctx.Queue(maxsize=max(64, len(shards) * threads * 4))
+    workers = [ctx.Process(target=run_shard, args=(i, shard, threads, force, results), name=f'shard-{i}')
+               for i, shard in enumerate(shards)]
+    # Process con (spawn) doc bien moi truong luc start: dat tam phan toc do cua shard
+    env = shard_rate_env(len(workers))
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    try:
+        for worker in workers:
+            worker.start()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    stats = {'total': len(urls), 'success': 0, 'unchanged': 0, 'error': 0}
+    finished = set()
+    start = time.perf_counter()
+    last_report = start
+    while len(finished) < len(workers):
+        try:
+            record = results.get(timeout=5)
+        except queue.Empty:
+            # Process chet giua chung (OOM, Chromium crash...) khong gui duoc 'done'
+            for i, worker in enumerate(workers):
+                if i not in finished and worker.exitcode not in (None, 0):
+                    print(f"[!] Shard {i} dung voi exit code {worker.exitcode}")
+                    finished.add(i)
+            continue
+
+        if isinstance(record, tuple):
+            finished.add(record[1])
+            continue
+
+        store_result(record, buffer)
+        stats[record['status']] += 1
+
+        now = time.perf_counter()
+        if now - last_report >= 10:
+            done = stats['success'] + stats['unchanged'] + stats['error']
+            print(f"[*] {done}/{len(urls)} URL ({done / (now - start):.1f} trang/giay), loi {stats['error']}")
+            last_report = now
+
+    for worker in workers:
+        worker.join()
+    buffer.close()
+    stats['seconds'] = round(time.perf_counter() - start, 1)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Crawl CellphoneS bang nhieu process, mot luong ghi database')
+    parser.add_argument('urls', nargs='*', help='URL san pham')
+    parser.add_argument('--csv', help='File CSV co cot URL')
+    parser.add_argument('--sitemap', help='Sitemap (URL hoac file, .xml / .xml.gz / sitemap index)')
+    parser.add_argument('--listing', help='Trang danh sach CellphoneS (can Chromium)')
+    parser.add_argument('--limit', type=int, help='So URL toi da')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='So process crawl (mac dinh = so core)')
+    parser.add_argument('--threads', type=int, default=POOL_SIZE,
+                        help='So URL song song moi process (= so tab Chromium, BROWSER_POOL_SIZE)')
+    parser.add_argument('--force', action='store_true', help='Crawl day du ca trang khong doi')
+    parser.add_argument('--resume', action='store_true', help='Bo qua URL da xong o lan chay truoc')
+    parser.add_argument('--state', default='crawl_state.db', help='File SQLite luu trang thai crawl')
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.csv:
+        urls += urls_from_csv(args.csv)
+    if args.sitemap:
+        urls += urls_from_sitemap(args.sitemap)
+    if args.listing:
+        urls += urls_from_listing(args.listing, args.limit)
+    urls = list(dict.fromkeys(urls))[:args.limit]
+    if not urls:
+        parser.error('Can it nhat mot nguon URL (tham so, --csv, --sitemap hoac --listing)')
+
+    from crawl_state import CrawlState
+    from database import init_db
+
+    init_db()
+    state = job_id = None
+    total = len(urls)
+    if args.resume:
+        state = CrawlState(args.state)
+        job_id = 'sharded:' + hashlib.sha1('\n'.join(sorted(urls)).encode('utf-8')).hexdigest()[:12]
+        state.start_job(job_id, urls, args.processes, source='cli')
+        urls = state.remaining(job_id)
+        print(f"[*] Resume: bo qua {total - len(urls)} URL da xong")
+
+    print(f"[*] Crawl {len(urls)} URL: {args.processes} process x {args.threads} luong")
+    stats = crawl_sharded(urls, args.processes, args.threads, args.force, state, job_id)
+    if state:
+        state.finish_job(job_id)
+
+    done = stats['success'] + stats['unchanged'] + stats['error']
+    print(f"[+] Xong {done} URL trong {stats['seconds']}s ({done / max(stats['seconds'], 0.1):.1f} trang/giay): "
+          f"{stats['success']} cap nhat, {stats['unchanged']} khong doi, {stats['error']} loi")
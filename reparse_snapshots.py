@@ -0,0 +1,145 @@
+"""
+Parse lai san pham tu snapshot da luu, khong crawl lai
+
+Sau khi sua selector / parser: lay HTML moi nhat cua moi URL (+ modal thong
+so neu co) trong SNAPSHOT_DIR, parse song song nhieu process va ghi lai bang
+products (mot luong ghi, theo lo). Chi ghi dong co du lieu thay doi.
+
+    python reparse_snapshots.py                          # moi san pham CellphoneS
+    python reparse_snapshots.py --url https://cellphones.com.vn/...
+    python reparse_snapshots.py --dry-run                # chi dem so dong se doi
+    python reparse_snapshots.py --phongvu-output pv.ndjson   # Phong Vu tu __NEXT_DATA__
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cellphones-web'))
+from database import get_product_by_url, init_db
+from product_parser import parse_product_html, parse_spec_rows
+from snapshots import HTML, NEXT_DATA, get_store
+from write_buffer import WriteBuffer
+
+
+# Cac cot so sanh de biet dong co doi khong
+COMPARE_FIELDS = ('name', 'brand', 'price', 'original_price', 'discount', 'image', 'specs')
+
+
+def parse_snapshot(item):
+    """Parse mot snapshot (chay trong process con), tra ve (url, product | None, loi)"""
+    store = get_store()
+    html = store.get(item['hash'])
+    if html is None:
+        return item['url'], None, 'mat blob HTML'
+
+    product = parse_product_html(html, item['url'])
+
+    modal_html = store.get(item['modal_hash']) if item['modal_hash'] else None
+    if modal_html:
+        specs = parse_spec_rows(BeautifulSoup(modal_html, 'html.parser').select('tr'))
+        if specs:
+            product['specs'] = specs
+
+    if not product['name']:
+        return item['url'], None, 'khong doc duoc ten'
+    return item['url'], product, None
+
+
+def changed(old, new):
+    """San pham parse lai co khac dong dang luu"""
+    if old is None:
+        return True
+    if bool(old['in_stock']) != bool(new['in_stock']):
+        return True
+    return any(old[field] != new[field] for field in COMPARE_FIELDS)
+
+
+def reparse_products(url=None, workers=None, dry_run=False):
+    """Parse lai snapshot HTML -> products, tra ve dict thong ke"""
+    items = get_store().latest(HTML, url=url)
+    stats = {'snapshots': len(items), 'changed': 0, 'unchanged': 0, 'failed': 0}
+    buffer = WriteBuffer()
+
+    with ProcessPoolExecutor(workers) as executor:
+        for item, (url, product, error) in zip(items, executor.map(parse_snapshot, items, chunksize=32)):
+            if error:
+                stats['failed'] += 1
+                print(f"[!] {url}: {error}")
+                continue
+
+            old = get_product_by_url(url)
+            if not changed(old, product):
+                stats['unchanged'] += 1
+                continue
+            stats['changed'] += 1
+            if dry_run:
+                continue
+
+            # Giu validator, van tay va thoi diem crawl: parse lai khong phai la
+            # crawl moi. Snapshot co the la DOM cua browser, hash tren no se
+            # khong bao gio khop voi ban HTTP ma crawler so sanh
+            product['content_hash'] = old['content_hash'] if old else None
+            if old:
+                product['etag'] = old['etag']
+                product['last_modified'] = old['last_modified']
+            buffer.save_product(product, updated_at=old['updated_at'] if old else item['created_at'])
+
+    buffer.close()
+    return stats
+
+
+def reparse_phongvu(output):
+    """Dung lai file san pham Phong Vu tu __NEXT_DATA__ da luu, tra ve so san pham"""
+    from crawl_output import NDJSONWriter, is_ndjson_path
+    from crawl_phongvu import find_products, parse_product
+
+    store = get_store()
+    products = {}
+    for item in store.latest(NEXT_DATA):
+        data = store.get(item['hash'])
+        if data is None:
+            continue
+        page_props = json.loads(data).get('props', {}).get('pageProps', {})
+        for p in find_products(page_props):
+            product = parse_product(p)
+            products[product['sku']] = product
+
+    if is_ndjson_path(output):
+        with NDJSONWriter(output) as writer:
+            for product in products.values():
+                writer.write(product)
+    else:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(list(products.values()), f, ensure_ascii=False, indent=2)
+    return len(products)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Parse lai san pham tu snapshot da luu')
+    parser.add_argument('--url', help='Chi parse lai mot URL')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='So process parse song song')
+    parser.add_argument('--dry-run', action='store_true', help='Khong ghi database, chi dem so dong se doi')
+    parser.add_argument('--phongvu-output', help='Dung lai file san pham Phong Vu (.json / .ndjson) tu __NEXT_DATA__')
+    parser.add_argument('--stats', action='store_true', help='In thong ke kho snapshot roi thoat')
+    args = parser.parse_args()
+
+    if args.stats:
+        print(json.dumps(get_store().stats(), indent=2))
+        sys.exit(0)
+
+    start = time.perf_counter()
+    if args.phongvu_output:
+        count = reparse_phongvu(args.phongvu_output)
+        print(f"[*] Da ghi {count} san pham Phong Vu vao {args.phongvu_output}")
+    else:
+        init_db()
+        stats = reparse_products(args.url, args.workers, args.dry_run)
+        print(f"[*] {stats['snapshots']} snapshot: {stats['changed']} doi"
+              f"{' (dry run)' if args.dry_run else ''}, {stats['unchanged']} giu nguyen, {stats['failed']} loi")
+    print(f"[*] Xong trong {time.perf_counter() - start:.1f}s")